@@ -1,6 +1,6 @@
 # Launch.py
 import os,re, time
-from helium_boot import boot_and_xray
+from helium_boot import boot_and_xray, retire_browser, stop_playwright
 from getCategoryRev import get_category_revenue
 from competitors import run_competitors_flow
 from monthlyrev import run_monthlyrev
@@ -145,8 +145,7 @@ for attempt in range(1, MAX_RETRIES + 1):
             # [p.close() for p in browser.pages]
             all_pages = ctx.pages
             [p.close() for p in all_pages]
-            browser.close()
-            pw.stop()
+            retire_browser(browser)
             #open new browser and playwright session
             pw, browser, ctx, target_page = boot_and_xray(
                 chrome_path=CHROME_PATH,
@@ -299,5 +298,4 @@ else:
                 
 print(scraper_results)
 input("Press Enter to disconnect…")
-browser.close()
-pw.stop()
+stop_playwright()  # also drops the pooled connection; Chrome keeps running
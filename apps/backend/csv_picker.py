@@ -22,6 +22,9 @@ _DATE_FORMATS = (
     "%b %d, %Y",       # Aug 01, 2025
 )
 
+# $ and thousands separators, dropped in one str.translate pass
+_STRIP_CURRENCY = str.maketrans("", "", "$,")
+
 def _to_number(s: str) -> Optional[float]:
     """Convert currency/number like '$12,345.67' -> 12345.67; returns None if blank/invalid."""
     if s is None:
@@ -35,7 +38,7 @@ def _to_number(s: str) -> Optional[float]:
         neg = True
         s = s[1:-1]
     # Remove $ and commas and spaces
-    s = s.replace("$", "").replace(",", "").strip()
+    s = s.translate(_STRIP_CURRENCY).strip()
     if not s:
         return None
     try:
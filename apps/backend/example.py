@@ -1,72 +1,35 @@
-import sys
-import subprocess
 import time
-from pathlib import Path
-from playwright.sync_api import sync_playwright
-from playwright.sync_api import Browser, Page
-from typing import Dict
-from profitcal import  get_profitability_metrics
-from helium_boot import _find_free_port, _cdp_ready
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from helium_boot import _ensure_chrome_running, _wake_extension, get_playwright
 from main_loop import get_configg
 
 USER_DATA_DIR, PROFILE_DIR, CHROME_PATH, EXT_ID, CDP_PORT = get_configg()
-def open_browser(chrome_path, user_data_dir, profile_dir, cdp_port, ext_id, popup_visible=False):
-    #open browser
-    chrome = Path(chrome_path)
-    if not chrome.exists():
-        raise FileNotFoundError(f"Chrome not found: {chrome_path}")
+MAX_PARALLEL = 4  # URLs in flight at once; their calculator reads still take turns (CALCULATOR_LOCK)
 
-    udd = Path(user_data_dir); udd.mkdir(parents=True, exist_ok=True)
+def _retriable_errors() -> tuple:
+    """
+    Worth another attempt: page/CDP timeouts and hiccups, and profitcal's "calculator UI did not appear".
+    Built on first use so importing this module doesn't load the Playwright bindings.
+    """
+    from playwright.sync_api import Error as PWError, TimeoutError as PWTimeout
 
-    if cdp_port is None:
-        cdp_port = _find_free_port()
+    return (PWTimeout, PWError, ConnectionError, TimeoutError, RuntimeError)
 
-    if not _cdp_ready(cdp_port):
-        print(f"[info] Launching Chrome on port {cdp_port}...")
-        args = [
-            str(chrome),
-            f"--remote-debugging-port={cdp_port}",
-            f"--user-data-dir={user_data_dir}",
-            f"--profile-directory={profile_dir}",
-            "--no-first-run",
-            "--no-default-browser-check",
-            "about:blank",
-        ]
-        creationflags = 0
-        if sys.platform.startswith("win"):
-            creationflags = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
-        subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=creationflags)
-
-        deadline = time.time() + 25
-        while time.time() < deadline and not _cdp_ready(cdp_port):
-            time.sleep(0.2)
-        if not _cdp_ready(cdp_port):
-            raise TimeoutError(f"CDP not ready on 127.0.0.1:{cdp_port}")
-        print(f"[info] Chrome launched and CDP ready on {cdp_port}")
-    else:
-        print(f"[info] Reusing existing Chrome CDP on {cdp_port}")
+def open_browser(chrome_path, user_data_dir, profile_dir, cdp_port, ext_id, popup_visible=False):
+    #open browser
+    cdp_port, _ = _ensure_chrome_running(chrome_path, user_data_dir, profile_dir, cdp_port)
 
     cdp_url  = f"http://127.0.0.1:{cdp_port}"
-    popup_url = f"chrome-extension://{ext_id}/popup.html"
 
     print("[info] Connecting Playwright to Chrome...")
-    pw = sync_playwright().start()
+    pw = get_playwright()
     browser = pw.chromium.connect_over_cdp(cdp_url)
     ctx = browser.contexts[0] if browser.contexts else browser.new_context()
 
-    # Open extension popup just to send the message
-    popup = ctx.new_page()
-    popup.goto(popup_url, wait_until="domcontentloaded")
-    print("[info] Opened Helium popup (transient).")
-
-    if not popup_visible:
-        try:
-            popup.close()
-            print("[info] Closed Helium popup tab (minimal UI).")
-        except Exception:
-            pass
+    _wake_extension(ctx, ext_id, popup_visible=popup_visible)
     
-    return browser, ctx
+    return browser, ctx, cdp_port
 
 urls = [
     "https://www.amazon.de/-/en/Burts-Bees-Lotion-Original-Scent/dp/B0043QASFO/ref=sr_1_1?crid=2AUT5ATDYVYKK&dib=eyJ2IjoiMSJ9.m61-P2W4KfDY1xa8nnBtaSfU87fjhD7fB6zRwvWVDw-RhrjCqecayVH5jKWaCFsFszN6U9f4c2SZ7ANqGrCXz-kek8w6jcpP40mIquSnUd7Jq3axSEiQtIaCWOjEsCk8JfzhQEAUEOqN2GVObWpA4V62UqUsCT_J1Ol0yMbPfkmvqfj3BXqyR_jKQFZSx40A2ni5khRj3DQ2D5p0cfZLEZSjDqc2TUwf3mn6CSu4MjU.cJ0v74ksqrPZwRukklApHHkEGFdYrTjiqh899kPVbJo&dib_tag=se&keywords=lotion&qid=1755640906&rdc=1&s=books&sprefix=lotion%2Cstripbooks%2C537&sr=1-1&th=1",
@@ -76,26 +39,65 @@ urls = [
 "https://www.amazon.co.uk/dp/B08MJZYW8P/?_encoding=UTF8&pd_rd_i=B08MJZYW8P&ref_=sbx_be_s_sparkle_ssd_img&qid=1755638428&pd_rd_w=7ry6l&content-id=amzn1.sym.9d6f7116-ba35-475e-b72d-f446e04d6cf3%3Aamzn1.sym.9d6f7116-ba35-475e-b72d-f446e04d6cf3&pf_rd_p=9d6f7116-ba35-475e-b72d-f446e04d6cf3&pf_rd_r=9W3Q29Y8Y2T2NKS3X5NV&pd_rd_wg=dJxbm&pd_rd_r=5f269e58-e6f1-4d70-938e-0ffc690c3699&pd_rd_plhdr=t&th=1","https://www.amazon.com/Paulas-Choice-Hydrating-Chamomile-Anti-Aging/dp/B00DH209KO/ref=sr_1_1_sspa?crid=5GOZ1YLCJ72P&dib=eyJ2IjoiMSJ9.qCcBDScx-tEi1e--J9aw0C14arfS2QmOqFt-vV9gk0tIvlZI52HwIbav-xcFdzIgiEKS2HgtLCQIRQQWOxkG6YmsmIjEZjR3YwRakfm8H8aol3F-xst-KJjQhBrcpX039HPC6CAXHv9bVO4JPZPdEIc4ncaYuZUgULzwjZmkZ2WhlbD7g2tJwYFXKUYAe-trEbA9qgPhhFZ6dcI4MXtgPilNERxlN4lwHg3N8PqYIOIVM4qvz3rBu46jt6TLfbSr5-R4h983wzU4QVRejLnpzPHjab3blQMZGaqna51vGHg.9jWTNq94nRo2o6TZGxcu5hSl018l838pGRNYqNA2NG4&dib_tag=se&keywords=face+wash&qid=1755638581&sprefix=face+wash%2Caps%2C889&sr=8-1-spons&sp_csd=d2lkZ2V0TmFtZT1zcF9hdGY&psc=1"
 ]
 
-browser, ctx = open_browser(CHROME_PATH, USER_DATA_DIR, PROFILE_DIR, CDP_PORT, EXT_ID)
-
-for url in urls:
-    for _ in range(5):
-        try:
-            metrics = get_profitability_metrics(
-                browser,
-                product_url=url,
-                wait_secs=60,
-                close_all_tabs_first=False,
-                close_others_after_open=True,
-            )
-            print(metrics, "for url", url)
-            break
-        except Exception as e:
-            print("ERRRRRRRRRRRRRRRRRR",e)
-
-
-
-
-
-
-
+def _scrape_url(url: str, cdp_url: str, attempts: int = 5) -> Tuple[Optional[dict], int]:
+    """
+    Scrape one URL with up to `attempts` tries, backing off between retriable failures.
+    Returns (metrics or None, attempts used). Runs on its thread's Playwright driver (sync objects
+    must stay on the thread that made them) attached to the shared Chrome, so the Helium extension
+    and login of the default context apply.
+    """
+    from profitcal import CALCULATOR_LOCK, get_profitability_metrics
+    retriable = _retriable_errors()
+
+    browser = get_playwright().chromium.connect_over_cdp(cdp_url)
+    try:
+        for attempt in range(1, attempts + 1):
+            try:
+                # the calculator one URL at a time; connects and retry back-offs still overlap
+                with CALCULATOR_LOCK:
+                    metrics = get_profitability_metrics(
+                        browser,
+                        product_url=url,
+                        wait_secs=60,
+                        close_all_tabs_first=False,
+                        close_others_after_open=False,  # would close the other workers' tabs
+                    )
+                print(metrics, "for url", url)
+                return metrics, attempt
+            except retriable as e:
+                print("ERRRRRRRRRRRRRRRRRR",e)
+                if attempt < attempts:
+                    time.sleep(min(30, 2 ** attempt))
+            except Exception as e:
+                print("[ERROR] permanent failure for url", url, e)
+                return None, attempt
+        return None, attempts
+    finally:
+        browser.close()  # disconnect only; Chrome keeps running
+
+def _to_columns(urls, results) -> Dict[str, list]:
+    """
+    SoA view of the run: {"url": [...], "attempts": [...], "<metric>_text": [...], "<metric>_number": [...]}.
+    Failed URLs keep their row with None values so every column stays aligned.
+    """
+    cols: Dict[str, list] = {"url": list(urls), "attempts": [n for _, n in results]}
+    for i, (metrics, _) in enumerate(results):
+        for name, val in (metrics or {}).items():
+            for part in ("text", "number"):
+                cols.setdefault(f"{name}_{part}", [None] * len(results))[i] = val.get(part)
+    return cols
+
+def scrape_all(urls, cdp_port, workers: int = MAX_PARALLEL) -> Dict[str, list]:
+    """Scrape the URLs on a pool of workers (one tab each); returns the run as columns (see _to_columns)."""
+    cdp_url = f"http://127.0.0.1:{cdp_port}"
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda u: _scrape_url(u, cdp_url), urls))
+    return _to_columns(urls, results)
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    browser, ctx, cdp_port = open_browser(CHROME_PATH, USER_DATA_DIR, PROFILE_DIR, CDP_PORT, EXT_ID)
+    df = pd.DataFrame(scrape_all(urls, cdp_port))
+    df.to_csv("profitability_run.csv", index=False)
+    print(df)
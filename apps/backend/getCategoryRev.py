@@ -1,38 +1,63 @@
 # get_category_rev.py
+from __future__ import annotations
+
 import re, time
-from typing import Optional, Tuple, Dict
-from playwright.sync_api import Browser, Page
+from typing import TYPE_CHECKING, Optional, Tuple, Dict
+from helium_boot import recent_pages
+
+if TYPE_CHECKING:  # annotations only; the page objects come from the caller's Playwright
+    from playwright.sync_api import Browser, Page
+
+# Patterns used on every URL x retry, compiled once
+_WS_RE = re.compile(r"\s+")
+_LOAD_MORE_RE = re.compile(r"^\s*Load More\s*$", re.I)
+_TOTAL_REV_RE = re.compile(r"^\s*Total\s+Revenue\s*$", re.I)
+
+# _normalize_currency_number: K/M/B multipliers and the chars that may group digits
+_SUFFIX_MULT = {"K": 1_000, "k": 1_000, "M": 1_000_000, "m": 1_000_000, "B": 1_000_000_000, "b": 1_000_000_000}
+_SPACE_CHARS = frozenset(" \u00A0\u202F\u2009\u2007\u2060'")
 
 def _clean(s: Optional[str]) -> str:
-    import re
-    return re.sub(r"\s+", " ", s or "").strip()
+    return _WS_RE.sub(" ", s or "").strip()
 
 def _find_xray_page(browser: Browser, timeout_ms: int = 1500) -> Optional[Page]:
-    """Return the Amazon tab that actually has the XRAY overlay text visible."""
-    for ctx in browser.contexts:
-        for pg in ctx.pages:
-            if "amazon." not in pg.url:
-                continue
-            try:
-                pg.get_by_text("Xray", exact=False).first.wait_for(timeout=timeout_ms)
+    """
+    Return the Amazon tab that has the XRAY overlay. Tabs are checked newest first with an
+    instant locator count; only if none has the panel yet does the newest Amazon tab get
+    timeout_ms for the 'Xray' text to show up.
+    """
+    amazon = [pg for pg in recent_pages(browser) if "amazon." in pg.url]
+    for pg in amazon:
+        try:
+            if pg.locator("#h10-style-container .react-draggable.resizable").count() > 0:
                 return pg
-            except Exception:
-                pass
+        except Exception:
+            pass
+    if amazon:
+        try:
+            amazon[0].get_by_text("Xray", exact=False).first.wait_for(timeout=timeout_ms)
+            return amazon[0]
+        except Exception:
+            pass
     return None
 
+# Per-strategy budget in _click_load_more; Playwright's 30s default would stall every fallback
+LOAD_MORE_STEP_MS = 1500
+
 def _click_load_more(page: Page) -> bool:
     """Try multiple strategies to click 'Load More'. Return True if clicked."""
     clicked = False
-    load_more = page.get_by_role("button", name=re.compile(r"^\s*Load More\s*$", re.I))
+    load_more = page.get_by_role("button", name=_LOAD_MORE_RE)
     try:
-        load_more.wait_for(timeout=4000)
-        load_more.scroll_into_view_if_needed()
+        # XRAY panel was already confirmed by _find_xray_page, so the button shows up quickly
+        load_more.wait_for(timeout=2000)
+        load_more.scroll_into_view_if_needed(timeout=LOAD_MORE_STEP_MS)
         try:
-            load_more.click(timeout=1500)
+            load_more.click(timeout=LOAD_MORE_STEP_MS)
             print("[INFO] Load More clicked (normal).")
             return True
         except Exception:
-            el = load_more.element_handle()
+            el = load_more.element_handle(timeout=LOAD_MORE_STEP_MS)
             if el:
                 page.evaluate("(el)=>el.click()", el)
                 print("[INFO] Load More clicked (programmatic).")
@@ -41,8 +66,8 @@ def _click_load_more(page: Page) -> bool:
         # fallback selector
         try:
             load_more = page.locator("button:has-text('Load More')").first
-            load_more.scroll_into_view_if_needed()
-            el = load_more.element_handle()
+            load_more.scroll_into_view_if_needed(timeout=LOAD_MORE_STEP_MS)
+            el = load_more.element_handle(timeout=LOAD_MORE_STEP_MS)
             if el:
                 page.evaluate("(el)=>el.dispatchEvent(new MouseEvent('click',{bubbles:true,cancelable:true}))", el)
                 print("[INFO] Load More clicked (dispatchEvent fallback).")
@@ -93,17 +118,55 @@ def _click_load_more(page: Page) -> bool:
 
 
 
+def _total_revenue_value(page: Page):
+    """Locator for the value tile directly BELOW the 'Total Revenue' label and NEAR it (not the right tile)."""
+    return page.locator(
+        "div.sc-iYRSqv.jktLat"
+        ":below(:text('Total Revenue'))"
+        ":near(:text('Total Revenue'), 140)"   # keep it close to the label
+    ).first
+
+def _peek_total_revenue(page: Page, timeout_ms: int = 1500) -> str:
+    """Current Total Revenue tile text, or '' if it isn't rendered yet."""
+    try:
+        return _total_revenue_value(page).inner_text(timeout=timeout_ms).strip()
+    except Exception:
+        return ""
+
+# A refreshed total must read the same this many polls in a row (a half-updated tile doesn't count)
+_REFRESH_STABLE_POLLS = 3
+
+def _wait_for_revenue_refresh(page: Page, before: str, timeout_ms: int = 30000) -> bool:
+    """
+    After 'Load More', return True once the Total Revenue tile differs from `before` (the extra
+    products were added) and has settled, or False after timeout_ms. Without a baseline the
+    first render can't be told from a refresh, so that case keeps the old fixed wait.
+    """
+    if not before:
+        print("[INFO] No Total Revenue baseline; waiting the full time.")
+        page.wait_for_timeout(timeout_ms)
+        return True
+    deadline = time.monotonic() + timeout_ms / 1000
+    last, same = None, 0
+    while time.monotonic() < deadline:
+        now = _peek_total_revenue(page, timeout_ms=1000)
+        if now and now != before:
+            same = same + 1 if now == last else 1
+            if same >= _REFRESH_STABLE_POLLS:
+                return True
+        else:
+            same = 0
+        last = now
+        page.wait_for_timeout(250)
+    return False
+
 def _extract_total_revenue(page: Page) -> Tuple[str, str]:
     # 1) Anchor on the label (case-insensitive)
-    label = page.get_by_text(re.compile(r"^\s*Total\s+Revenue\s*$", re.I)).first
+    label = page.get_by_text(_TOTAL_REV_RE).first
     label.wait_for(timeout=8000)
 
     # 2) Value is directly BELOW the label and NEAR it (not to the right tile)
-    value = page.locator(
-        "div.sc-iYRSqv.jktLat"
-        ":below(:text('Total Revenue'))"
-        ":near(:text('Total Revenue'), 140)"   # keep it close to the label
-    ).first
+    value = _total_revenue_value(page)
 
     try:
         value.wait_for(state="visible", timeout=3000)
@@ -118,39 +181,42 @@ def _extract_total_revenue(page: Page) -> Tuple[str, str]:
             (labelEl) => {
               const rectL = labelEl.getBoundingClientRect();
               const centerLX = rectL.left + rectL.width/2;
-              const isVisible = (el) => {
-                if (!el) return false;
-                const cs = getComputedStyle(el);
-                if (cs.display === 'none' || cs.visibility === 'hidden') return false;
-                const r = el.getBoundingClientRect();
-                return r.width > 0 && r.height > 0;
-              };
               // Currency-ish text (any symbol/code + grouped digits + optional decimal + K/M/B)
               const RE = /^(?:\\p{Sc}|USD|GBP|EUR|CAD|AUD|AED|د\\.?إ|A\\$|AU\\$|C\\$|CA\\$)?\\s*\\d[\\d\\s',.\\u00A0\\u202F\\u2009\\u2007\\u2060]*(?:[.,]\\d+)?\\s*(?:[KMB])?$/iu;
 
-              const cands = Array.from(document.querySelectorAll('div.sc-iYRSqv.jktLat, div, span, p, b, strong, em'))
-                .filter(isVisible)
-                .map(e => {
-                  const t = (e.innerText || '').trim();
-                  const r = e.getBoundingClientRect();
-                  return {e, t, r};
-                })
-                .filter(o => o.t && RE.test(o.t) && o.r.top >= rectL.bottom - 2) // strictly below label
-                // keep nearby only
-                .filter(o => (o.r.top - rectL.bottom) <= 200 && Math.abs((o.r.left + o.r.width/2) - centerLX) <= 180)
-                .sort((a,b) => {
-                  // prioritize smallest vertical gap, then total distance
-                  const dyA = Math.max(0, a.r.top - rectL.bottom);
-                  const dyB = Math.max(0, b.r.top - rectL.bottom);
-                  if (dyA !== dyB) return dyA - dyB;
-                  const cxA = a.r.left + a.r.width/2, cyA = a.r.top + a.r.height/2;
-                  const cxB = b.r.left + b.r.width/2, cyB = b.r.top + b.r.height/2;
-                  const dA = Math.hypot(cxA - centerLX, cyA - rectL.bottom);
-                  const dB = Math.hypot(cxB - centerLX, cyB - rectL.bottom);
-                  return dA - dB;
-                });
-
-              return cands.length ? cands[0].t : null;
+              // 1) Layout-free pass: leaf elements (plus the Helium value class) whose text looks
+              //    like an amount. textContent doesn't force layout; skipping containers drops
+              //    the thousands of wrapper divs the old scan measured one by one.
+              const nodes = [];
+              for (const e of document.querySelectorAll('div.sc-iYRSqv.jktLat, div, span, p, b, strong, em')) {
+                if ((e.childElementCount === 0 || e.matches('div.sc-iYRSqv.jktLat')) &&
+                    RE.test((e.textContent || '').trim())) nodes.push(e);
+              }
+
+              // 2) Read every candidate's box once into a flat [top, left, width, height] array
+              const n = nodes.length;
+              const box = new Float64Array(n * 4);
+              for (let i = 0; i < n; i++) {
+                const r = nodes[i].getBoundingClientRect();
+                box[i*4] = r.top; box[i*4+1] = r.left; box[i*4+2] = r.width; box[i*4+3] = r.height;
+              }
+
+              // 3) Strictly below + near the label; smallest vertical gap, then total distance
+              let best = -1, bestDy = Infinity, bestD = Infinity;
+              for (let i = 0; i < n; i++) {
+                const top = box[i*4], left = box[i*4+1], w = box[i*4+2], h = box[i*4+3];
+                if (w <= 0 || h <= 0 || top < rectL.bottom - 2) continue;
+                const cx = left + w/2;
+                if ((top - rectL.bottom) > 200 || Math.abs(cx - centerLX) > 180) continue;
+                const dy = Math.max(0, top - rectL.bottom);
+                const d = Math.hypot(cx - centerLX, top + h/2 - rectL.bottom);
+                if (dy > bestDy || (dy === bestDy && d >= bestD)) continue;
+                const cs = getComputedStyle(nodes[i]);
+                if (cs.display === 'none' || cs.visibility === 'hidden') continue;
+                best = i; bestDy = dy; bestD = d;
+              }
+
+              return best >= 0 ? (nodes[best].innerText || '').trim() : null;
             }
             """,
             el
@@ -171,42 +237,38 @@ def _normalize_currency_number(s: str) -> str:
       - thousand separators: space/NBSP/thin/apostrophe/comma/dot
       - decimal comma or dot
       - K/M/B suffix
+    Single pass over the characters: the decimal separator is the last '.' or ',' with a digit
+    right before and after it (ignoring dropped symbols); every other separator is thousands.
     """
     s = s.strip()
 
     # Extract suffix (K/M/B)
-    suffix_match = re.search(r'([KMB])\s*$', s, flags=re.I)
     mult = 1
-    if suffix_match:
-        mult = {'K': 1_000, 'M': 1_000_000, 'B': 1_000_000_000}[suffix_match.group(1).upper()]
-        s = s[:suffix_match.start()].strip()
-
-    # Keep only digits, commas, dots, and common spaces/apostrophes as potential separators
-    cleaned = re.sub(r"[^\d\.,\u0020\u00A0\u202F\u2009\u2007\u2060']", "", s)
-
-    # Normalize all spaces/apostrophes to a plain space
-    cleaned = re.sub(r"[\u00A0\u202F\u2009\u2007\u2060']", " ", cleaned)
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
-
-    # Detect decimal separator: last occurrence of [.,] that has digits on both sides.
-    last_sep = None
-    for m in re.finditer(r"[.,]", cleaned):
-        i = m.start()
-        if i > 0 and i < len(cleaned) - 1 and cleaned[i-1].isdigit() and cleaned[i+1].isdigit():
-            last_sep = i
-
-    # Remove thousands separators:
-    # - If we detected a decimal separator at 'last_sep', treat any other [., and spaces] as thousands.
-    # - If no decimal, treat all commas/dots/spaces as thousands.
-    if last_sep is not None:
-        dec_char = cleaned[last_sep]
-        int_part = re.sub(r"[^\d]", "", cleaned[:last_sep])
-        frac_part = re.sub(r"[^\d]", "", cleaned[last_sep+1:])
-        num_str = f"{int_part}.{frac_part}" if frac_part else int_part
-        val = float(num_str)
+    if s and s[-1] in _SUFFIX_MULT:
+        mult = _SUFFIX_MULT[s[-1]]
+        s = s[:-1]
+
+    digits = []
+    split = -1              # number of integer digits, once a decimal separator is seen
+    prev = prev2 = None     # kinds of the last two kept chars: "d" digit, "s" [.,], "w" space-like
+    for ch in s:
+        if ch.isdecimal():
+            if prev == "s" and prev2 == "d":
+                split = len(digits)
+            digits.append(ch)
+            kind = "d"
+        elif ch in ".,":
+            kind = "s"
+        elif ch in _SPACE_CHARS:
+            kind = "w"
+        else:
+            continue        # currency symbols/codes and anything else are dropped
+        prev2, prev = prev, kind
+
+    if split >= 0:
+        val = float(f"{''.join(digits[:split])}.{''.join(digits[split:])}")
     else:
-        int_part = re.sub(r"[^\d]", "", cleaned)
-        val = float(int_part or "0")
+        val = float("".join(digits) or "0")
 
     val *= mult
     return str(int(round(val)))
@@ -223,12 +285,15 @@ def get_category_revenue(browser: Browser, *, wait_after_click_ms: int = 15000)
     page = _find_xray_page(browser, timeout_ms=1200)
     if not page:
         raise RuntimeError("XRAY not detected on any Amazon tab.")
+    # No settle sleep: _click_load_more waits for its own button
     page.bring_to_front()
-    page.wait_for_timeout(500)
 
+    # the baseline has to be the rendered pre-Load-More total, so give the tile time to appear
+    before = _peek_total_revenue(page, timeout_ms=5000)
     if _click_load_more(page):
-        print("[INFO] Waiting 30s for data to refresh…")
-        page.wait_for_timeout(30000)
+        print("[INFO] Waiting (up to 30s) for data to refresh…")
+        if not _wait_for_revenue_refresh(page, before, timeout_ms=30000):
+            print("[WARN] Total Revenue did not change within 30s. Reading it anyway.")
     else:
         print("[WARN] Could not click 'Load More' (overlay likely intercepting). Continuing anyway.")
 
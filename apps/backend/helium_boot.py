@@ -1,14 +1,15 @@
-import sys, time, socket, subprocess
+import os, sys, time, random, socket, subprocess, threading, atexit
 from pathlib import Path
-from urllib.request import urlopen
-from urllib.error import URLError
-from playwright.sync_api import sync_playwright
-from playwright.sync_api import TimeoutError as PWTimeout
+from http.client import HTTPConnection
+# playwright is imported inside the functions that drive a page, so the port/CDP helpers
+# (_find_free_port, _port_open, _cdp_ready) import without loading the driver bindings
 
 def _wait_for_xray_panel(page, timeout_ms: int = 20000) -> bool:
     """
     Return True when the Xray overlay + some grid text is visible.
     """
+    from playwright.sync_api import TimeoutError as PWTimeout
+
     try:
         page.wait_for_selector("#h10-style-container .react-draggable.resizable",
                                state="visible", timeout=timeout_ms)
@@ -26,12 +27,32 @@ def _wait_for_xray_panel(page, timeout_ms: int = 20000) -> bool:
     return True
 
 
+def _wait_for_xray_results(page, timeout_ms: int = 20000) -> bool:
+    """
+    Return True as soon as the Xray panel shows its 'Total Revenue' summary (analysis done),
+    or False once timeout_ms runs out. The timeout is a ceiling, not a fixed wait.
+    """
+    from playwright.sync_api import TimeoutError as PWTimeout
+
+    deadline = time.monotonic() + timeout_ms / 1000
+    if not _wait_for_xray_panel(page, timeout_ms=timeout_ms):
+        return False
+    remaining = max(1, int((deadline - time.monotonic()) * 1000))
+    try:
+        page.get_by_text("Total Revenue", exact=False).first.wait_for(state="visible", timeout=remaining)
+        return True
+    except PWTimeout:
+        return False
+
+
 def _open_xray_via_widget(page, *, inject_settle_ms: int = 1500, menu_timeout_ms: int = 15000,
                           panel_timeout_ms: int = 20000) -> bool:
     """
     Hover the left Helium widget, click 'Xray — Amazon Product Research', wait for panel.
     Returns True if panel detected; False otherwise.
     """
+    from playwright.sync_api import TimeoutError as PWTimeout
+
     # Let extension inject
     page.wait_for_load_state("domcontentloaded")
     page.wait_for_timeout(inject_settle_ms)
@@ -126,35 +147,412 @@ def _open_xray_via_extension(ctx, *, ext_id: str, target_url: str,
     return target_page
 
 
+def _extension_worker(ctx, ext_id: str):
+    """The running MV3 service worker of extension ext_id in ctx, or None."""
+    prefix = f"chrome-extension://{ext_id}/"
+    try:
+        for worker in ctx.service_workers:
+            if worker.url.startswith(prefix):
+                return worker
+    except Exception:
+        pass
+    return None
+
+def _wake_extension(ctx, ext_id: str, *, popup_visible: bool = False, new_page=None) -> bool:
+    """
+    Make sure Helium is live before navigating. The transient popup only ever served to start the
+    extension's service worker, so when CDP already lists that worker the popup page load is skipped.
+    Returns True if the popup had to be opened.
+    """
+    if not popup_visible and _extension_worker(ctx, ext_id) is not None:
+        print("[info] Helium service worker already running; skipping popup.")
+        return False
+
+    popup_url = f"chrome-extension://{ext_id}/popup.html"
+    # A Chrome kept alive between runs may still have the popup open from last time
+    for page in ctx.pages:
+        if page.url.startswith(popup_url):
+            print("[info] Reusing open Helium popup.")
+            if popup_visible:
+                try: page.bring_to_front()
+                except Exception: pass
+            return False
+
+    popup = (new_page or ctx.new_page)()
+    popup.goto(popup_url, wait_until="domcontentloaded")
+    print("[info] Opened Helium popup (transient).")
+
+    # Optionally hide/close popup to keep things clean
+    if not popup_visible:
+        try:
+            popup.close()
+            print("[info] Closed Helium popup.")
+        except Exception:
+            pass
+    return True
+
 def _find_free_port() -> int:
-    s = socket.socket(); s.bind(("127.0.0.1", 0))
-    port = s.getsockname()[1]; s.close(); return port
+    """An OS-assigned free localhost port; the probe socket is always closed and doesn't block a rebind."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _port_open(port: int, host: str = "127.0.0.1", timeout: float = 0.2) -> bool:
+    """TCP connect probe: True once something (Chrome) listens on port. Much cheaper than an HTTP request."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        return s.connect_ex((host, port)) == 0
+
+# Keep-alive connection per (thread, port): repeat health checks skip the TCP handshake
+_CDP_CONNS = {}
 
 def _cdp_ready(port: int) -> bool:
-    try:
-        with urlopen(f"http://127.0.0.1:{port}/json/version", timeout=1.5) as r:
+    key = (threading.get_ident(), port)
+    # A kept connection may have been dropped by Chrome since the last probe: that case gets one
+    # retry on a fresh connection, so a stale socket never reads as "Chrome is down".
+    for fresh in (False, True):
+        conn = None if fresh else _CDP_CONNS.get(key)
+        reused = conn is not None
+        try:
+            if conn is None:
+                conn = _CDP_CONNS[key] = HTTPConnection("127.0.0.1", port, timeout=1.5)
+            conn.request("GET", "/json/version")
+            r = conn.getresponse()
+            r.read()  # drain so the connection can be reused
             return r.status == 200
-    except Exception:
+        except Exception:
+            _CDP_CONNS.pop(key, None)
+            conn.close()
+            if not reused:
+                return False
+    return False
+
+def shutdown_chrome(cdp_port: int) -> bool:
+    """
+    Quit the Chrome listening on cdp_port (Browser.close over CDP). Runs normally leave Chrome up so
+    the next one attaches instantly; this is the explicit teardown. False if nothing was listening.
+    """
+    if not (_port_open(cdp_port) and _cdp_ready(cdp_port)):
         return False
+    browser = get_playwright().chromium.connect_over_cdp(f"http://127.0.0.1:{cdp_port}")
+    try:
+        browser.new_browser_cdp_session().send("Browser.close")
+    except Exception:
+        pass  # Chrome may drop the connection before answering
+    finally:
+        try: browser.close()
+        except Exception: pass
+    print(f"[info] Chrome on {cdp_port} shut down")
+    return True
+
+# Playwright modules that call inspect.stack() on every API call, only to attach the caller's frames
+# to traces/logs. Walking (and reading the source of) every frame dominates CPU over the hundreds
+# of calls a calculator run makes. With PW_INSPECT_STACK=0 the call is swapped for a walk that stops
+# at the first frame outside the playwright package and reads no source: error prefixes
+# ("Locator.click: ...") and trace action names still come through, traces just lose the user
+# frames above the calling line. This patches private modules, so it is opt-in and only applied to
+# the Playwright version it was checked against; anything else keeps the stock capture.
+_PW_STACK_MODULES = ("_connection", "_sync_base", "_network")
+_PW_STACK_VERSIONS = frozenset({"1.40.0"})   # requirements.txt pin
+_PW_STACK_CHECKED = threading.Event()       # once per process; get_playwright runs on every thread
+
+def _skip_pw_stack_capture():
+    """Swap inspect.stack for a shallow, source-free walk in _PW_STACK_MODULES (see above)."""
+    if os.getenv("PW_INSPECT_STACK") != "0" or _PW_STACK_CHECKED.is_set():
+        return
+    _PW_STACK_CHECKED.set()
+    import importlib, inspect, types
+    from importlib import metadata
+    import playwright
+
+    try:
+        version = metadata.version("playwright")
+    except metadata.PackageNotFoundError:
+        version = None
+    mods = []
+    for name in _PW_STACK_MODULES:
+        try:
+            mods.append(importlib.import_module(f"playwright._impl.{name}"))
+        except ImportError:
+            break
+    if (version not in _PW_STACK_VERSIONS or len(mods) != len(_PW_STACK_MODULES)
+            or not all(getattr(mod, "inspect", None) is inspect for mod in mods)
+            or not hasattr(mods[0], "_extract_stack_trace_information_from_stack")):
+        print(f"[warn] PW_INSPECT_STACK=0 ignored: not checked against playwright {version}'s internals")
+        return
+
+    pw_dir = os.path.dirname(playwright.__file__)
+
+    def caller_stack(*_a, **_k):
+        # Same shape Playwright reads from inspect.stack(): [0] is the frame, then filename/lineno/function.
+        frames = []
+        f = sys._getframe(1)
+        while f is not None:
+            filename = f.f_code.co_filename
+            frames.append(inspect.FrameInfo(f, filename, f.f_lineno, f.f_code.co_name, None, None))
+            if not filename.startswith(pw_dir):  # first user frame: apiName is derived up to here
+                break
+            f = f.f_back
+        return frames
+
+    shim = types.ModuleType("inspect")
+    shim.__dict__.update(vars(inspect))
+    shim.stack = caller_stack
+    for mod in mods:
+        mod.inspect = shim
+
+# One Playwright driver (a Node subprocess) per thread, shared by every flow instead of one per call.
+# Sync Playwright objects are bound to the thread that created them, hence thread-local.
+_PW_LOCAL = threading.local()
+
+def get_playwright():
+    """This thread's shared sync Playwright instance, started on first use."""
+    pw = getattr(_PW_LOCAL, "pw", None)
+    if pw is None:
+        from playwright.sync_api import sync_playwright
+
+        _skip_pw_stack_capture()
+        pw = sync_playwright().start()
+        _PW_LOCAL.pw = pw
+    return pw
+
+def stop_playwright():
+    """Stop this thread's shared driver; the next get_playwright() starts a fresh one."""
+    pw = getattr(_PW_LOCAL, "pw", None)
+    _PW_LOCAL.pw = None
+    if pw is not None:
+        try:
+            pw.stop()
+        except Exception:
+            pass
+
+atexit.register(stop_playwright)
+
+# XRAY reads Helium's data, not the page's pictures/fonts/trackers; these are aborted on the target tab
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+_BLOCKED_URL_PARTS = ("doubleclick", "googletagmanager", "amazon-adsystem")
+
+def _block_heavy_resources(route):
+    req = route.request
+    url = req.url
+    # Never touch the extension's own resources (scripts/xhr it injects into the page)
+    if not url.startswith("chrome-extension://") and (
+        req.resource_type in _BLOCKED_RESOURCE_TYPES or any(p in url for p in _BLOCKED_URL_PARTS)
+    ):
+        return route.abort()
+    return route.continue_()
+
+# Pages of each pooled browser in open order, fed by ctx.on("page") so lookups don't scan every tab
+_TRACKED_PAGES = {}
+
+def _track_pages(browser, ctx):
+    pages = _TRACKED_PAGES.setdefault(id(browser), [])
+    pages.extend(ctx.pages)
+    ctx.on("page", pages.append)
+
+def recent_pages(browser) -> list:
+    """Open pages of browser, most recently opened first (all context pages if it isn't tracked)."""
+    pages = _TRACKED_PAGES.get(id(browser))
+    if pages is None:
+        return [pg for ctx in browser.contexts for pg in reversed(ctx.pages)]
+    pages[:] = [pg for pg in pages if not pg.is_closed()]
+    return pages[::-1]
+
+# Recycle the pooled connection after this many pages / seconds (keeps Chrome's tab + driver memory bounded)
+MAX_PAGES_PER_CONTEXT = 50
+MAX_CONTEXT_AGE_S = 30 * 60
+
+class ContextPool:
+    """
+    Keeps the Playwright connection to a CDP Chrome (and its default context) alive between
+    boot_and_xray calls instead of starting a driver + handshake every time.
+
+    Fresh contexts over CDP are incognito-like and don't carry the Helium extension, so the pooled
+    unit is the connection's default context. It is recycled (tabs closed, disconnected, new
+    connection) once it has opened max_pages pages, is older than max_age_s, lost its connection,
+    or was handed to retire(). Callers never close the pooled browser themselves: that would just
+    force the next acquire to reconnect. Entries are per thread: sync Playwright objects can't
+    cross threads.
+    """
+    def __init__(self, max_pages: int = MAX_PAGES_PER_CONTEXT, max_age_s: float = MAX_CONTEXT_AGE_S):
+        self.max_pages = max_pages
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def acquire(self, key, cdp_url: str) -> dict:
+        """Return {'pw', 'browser', 'ctx', 'pages', 'born'} for key, connecting if needed."""
+        key = (threading.get_ident(), *key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._usable(entry):
+                print("[info] Recycling pooled Chrome connection.")
+                self._retire(entry)
+                entry = None
+            if entry is None:
+                print("[info] Connecting Playwright to Chrome...")
+                pw = get_playwright()
+                browser = pw.chromium.connect_over_cdp(cdp_url)
+                ctx = browser.contexts[0] if browser.contexts else browser.new_context()
+                _track_pages(browser, ctx)
+                entry = {"pw": pw, "browser": browser, "ctx": ctx, "pages": 0, "born": time.monotonic()}
+                self._entries[key] = entry
+            return entry
+
+    def retire(self, browser):
+        """Drop this thread's entry for browser (e.g. XRAY never came up on it); the next acquire reconnects."""
+        tid = threading.get_ident()
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if key[0] == tid and entry["browser"] is browser:
+                    del self._entries[key]
+                    self._retire(entry)
+                    return
+
+    @staticmethod
+    def new_page(entry: dict):
+        entry["pages"] += 1
+        return entry["ctx"].new_page()
+
+    def _usable(self, entry: dict) -> bool:
+        if entry["pages"] >= self.max_pages or time.monotonic() - entry["born"] >= self.max_age_s:
+            return False
+        try:
+            return entry["browser"].is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _retire(entry: dict):
+        try:
+            for pg in list(entry["ctx"].pages):
+                pg.close()
+        except Exception:
+            pass
+        _TRACKED_PAGES.pop(id(entry["browser"]), None)
+        # Over CDP, close() only disconnects; Chrome itself and the shared driver keep running
+        try:
+            entry["browser"].close()
+        except Exception:
+            pass
+
+_POOL = ContextPool()
+
+def retire_browser(browser):
+    """Give up on a browser boot_and_xray returned, so the next boot_and_xray starts a fresh connection."""
+    _POOL.retire(browser)
+
+# Keep background tabs at full speed: the Helium popup is closed right away and the scraped tab is
+# often not in front. Images stay enabled (XRAY/Cerebro/calculator tabs use them; the XRAY target
+# tab blocks them per page instead), and no --no-sandbox outside Docker.
+_CHROME_PERF_ARGS = [
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    "--disable-features=TranslateUI",
+]
+
+# Chrome writes this to stderr once its DevTools HTTP server is bound (what puppeteer waits on too)
+_DEVTOOLS_LISTENING = b"DevTools listening on"
+
+def _watch_devtools_banner(proc) -> threading.Event:
+    """
+    Event set when Chrome announces DevTools on stderr, or when stderr closes (exit / hand-off to
+    an already running Chrome). The reader keeps draining afterwards so Chrome never blocks on the pipe.
+    """
+    ready = threading.Event()
+
+    def _drain():
+        try:
+            for line in proc.stderr:
+                if not ready.is_set() and _DEVTOOLS_LISTENING in line:
+                    ready.set()
+        except Exception:
+            pass
+        finally:
+            ready.set()
+
+    threading.Thread(target=_drain, name="chrome-stderr", daemon=True).start()
+    return ready
+
+def _ensure_chrome_running(chrome_path: str, user_data_dir: str, profile_dir: str,
+                           cdp_port: int | None) -> tuple[int, bool]:
+    """
+    Make sure a Chrome with remote debugging listens on cdp_port (None => pick a free port),
+    launching it if needed. Returns (cdp_port, reused) where reused means it was already running.
+    Shared by boot_and_xray and the open_browser helpers in example.py / manual.py.
+    """
+    chrome = Path(chrome_path)
+    if not chrome.exists():
+        raise FileNotFoundError(f"Chrome not found: {chrome_path}")
+
+    udd = Path(user_data_dir); udd.mkdir(parents=True, exist_ok=True)
 
-def _click_analyze_products(page, timeout_ms: int = 30000):
+    if cdp_port is None:
+        cdp_port = _find_free_port()
+
+    if _port_open(cdp_port) and _cdp_ready(cdp_port):
+        print(f"[info] Reusing existing Chrome CDP on {cdp_port}")
+        return cdp_port, True
+
+    print(f"[info] Launching Chrome on port {cdp_port}...")
+    args = [
+        str(chrome),
+        f"--remote-debugging-port={cdp_port}",
+        f"--user-data-dir={user_data_dir}",
+        f"--profile-directory={profile_dir}",
+        "--no-first-run",
+        "--no-default-browser-check",
+        *_CHROME_PERF_ARGS,
+        "about:blank",
+    ]
+    creationflags = 0
+    if sys.platform.startswith("win"):
+        creationflags = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, creationflags=creationflags)
+
+    # One blocking wait for the DevTools banner instead of waking up to poll
+    deadline = time.time() + 25
+    _watch_devtools_banner(proc).wait(25)
+
+    # Confirm over HTTP (always probed at least once); the back-off loop only spins if there was
+    # no banner, e.g. a hand-off to an already running Chrome
+    # starts short since Chrome usually binds within a second; 10% jitter so concurrent boots don't probe in lockstep
+    delay = 0.01
+    # cheap TCP probe first; the /json/version round-trip only once the port is open
+    while not (_port_open(cdp_port) and _cdp_ready(cdp_port)):
+        # exit code 0 = handed off to an already running Chrome; anything else is a crash
+        if proc.poll() not in (None, 0):
+            raise RuntimeError(f"Chrome exited with code {proc.returncode} before CDP came up")
+        if time.time() >= deadline:
+            raise TimeoutError(f"CDP not ready on 127.0.0.1:{cdp_port}")
+        time.sleep(delay + random.random() * delay * 0.1)
+        delay = min(0.2, delay * 2)
+    print(f"[info] Chrome launched and CDP ready on {cdp_port}")
+    return cdp_port, False
+
+def _click_analyze_products(page, timeout_ms: int = 30000, fallback_timeout_ms: int = 3000):
     """
     Try a few resilient strategies to click the 'Analyze Products' button.
+    Only the first strategy gets the full timeout_ms (that's where the button normally
+    appears); once it's known to be missing, each fallback gets fallback_timeout_ms.
     """
-    locators = [
-        page.get_by_role("button", name="Analyze Products", exact=True),
-        page.locator("button:has-text('Analyze Products')"),
+    strategies = [
+        (page.get_by_role("button", name="Analyze Products", exact=True), timeout_ms),
+        (page.locator("button:has-text('Analyze Products')"), fallback_timeout_ms),
         # last-resort: find the text node then climb to nearest button ancestor
-        page.locator("text=Analyze Products").locator("xpath=ancestor::button[1]"),
+        (page.locator("text=Analyze Products").locator("xpath=ancestor::button[1]"), fallback_timeout_ms),
     ]
-    for loc in locators:
+    for loc, t in strategies:
         try:
-            loc.wait_for(state="visible", timeout=timeout_ms)
+            loc.wait_for(state="visible", timeout=t)
             # Sometimes the button sits under a sticky header; scroll into view.
-            loc.scroll_into_view_if_needed(timeout=timeout_ms)
-            loc.click(timeout=timeout_ms)
-            print("[INFO] Clicked 'Analyze Products' button now sleeping for 20 secs.")
-            time.sleep(20)
+            loc.scroll_into_view_if_needed(timeout=t)
+            loc.click(timeout=t)
+            print("[INFO] Clicked 'Analyze Products' button; waiting for XRAY results.")
+            if not _wait_for_xray_results(page, timeout_ms=20_000):
+                print("[warn] XRAY results not detected within 20s; continuing anyway.")
             return True
         except Exception:
             continue
@@ -170,7 +568,8 @@ def boot_and_xray(
     target_url: str,
     cdp_port: int | None = 9666,      # None => auto free port
     wait_secs: int = 20,
-    popup_visible: bool = False       # open -> send -> (optionally) close
+    popup_visible: bool = False,      # open -> send -> (optionally) close
+    block_resources: bool = True      # abort images/media/fonts/ad trackers on the target tab
 ):
     """
     Launch Chrome (CDP), connect Playwright, trigger Helium XRAY for target_url,
@@ -178,62 +577,16 @@ def boot_and_xray(
 
     Returns: (playwright, browser, context, target_page)
     """
-    chrome = Path(chrome_path)
-    if not chrome.exists():
-        raise FileNotFoundError(f"Chrome not found: {chrome_path}")
-
-    udd = Path(user_data_dir); udd.mkdir(parents=True, exist_ok=True)
-    reuse = False
-
-    if cdp_port is None:
-        cdp_port = _find_free_port()
+    from playwright.sync_api import TimeoutError as PWTimeout
 
-    if not _cdp_ready(cdp_port):
-        print(f"[info] Launching Chrome on port {cdp_port}...")
-        args = [
-            str(chrome),
-            f"--remote-debugging-port={cdp_port}",
-            f"--user-data-dir={user_data_dir}",
-            f"--profile-directory={profile_dir}",
-            "--no-first-run",
-            "--no-default-browser-check",
-            "about:blank",
-        ]
-        creationflags = 0
-        if sys.platform.startswith("win"):
-            creationflags = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
-        subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=creationflags)
-
-        deadline = time.time() + 25
-        while time.time() < deadline and not _cdp_ready(cdp_port):
-            time.sleep(0.2)
-        if not _cdp_ready(cdp_port):
-            raise TimeoutError(f"CDP not ready on 127.0.0.1:{cdp_port}")
-        print(f"[info] Chrome launched and CDP ready on {cdp_port}")
-    else:
-        print(f"[info] Reusing existing Chrome CDP on {cdp_port}")
-        reuse=True
+    cdp_port, reuse = _ensure_chrome_running(chrome_path, user_data_dir, profile_dir, cdp_port)
 
     cdp_url  = f"http://127.0.0.1:{cdp_port}"
-    popup_url = f"chrome-extension://{ext_id}/popup.html"
 
-    print("[info] Connecting Playwright to Chrome...")
-    pw = sync_playwright().start()
-    browser = pw.chromium.connect_over_cdp(cdp_url)
-    ctx = browser.contexts[0] if browser.contexts else browser.new_context()
+    entry = _POOL.acquire((cdp_port, ext_id, profile_dir), cdp_url)
+    pw, browser, ctx = entry["pw"], entry["browser"], entry["ctx"]
 
-    # Open extension popup just to send the message
-    popup = ctx.new_page()
-    popup.goto(popup_url, wait_until="domcontentloaded")
-    print("[info] Opened Helium popup (transient).")
-    
-    # Optionally hide/close popup to keep things clean
-    if not popup_visible:
-        try:
-            popup.close()
-            print("[info] Closed Helium popup.")
-        except Exception:
-            pass
+    _wake_extension(ctx, ext_id, popup_visible=popup_visible, new_page=lambda: _POOL.new_page(entry))
 
     if reuse:
         # Close all existing pages in the context without closing the browser
@@ -244,13 +597,19 @@ def boot_and_xray(
                 print(f"[warn] Could not close page: {e}")
 
     # 2) Open the target URL in a fresh page
-    target_page = ctx.new_page()
+    target_page = _POOL.new_page(entry)
+    if block_resources:
+        # Page-level (not ctx.route) so later product/calculator tabs in the shared context load normally
+        target_page.route("**/*", _block_heavy_resources)
     print(f"[info] Navigating to target URL: {target_url}")
     target_page.goto(target_url, wait_until="domcontentloaded", timeout=120_000)
 
-    # 3) Sleep for 120 seconds (give the extension time to analyze/render)
-    print("[info] Sleeping 30 seconds to allow page/extension work...")
-    time.sleep(30)
+    # 3) Wait (up to 30s) for Helium to inject its page widget instead of sleeping a flat 30s
+    print("[info] Waiting for the Helium widget to load...")
+    try:
+        target_page.wait_for_selector("#h10-page-widget svg", state="visible", timeout=30_000)
+    except PWTimeout:
+        print("[warn] Helium widget not visible after 30s; trying 'Analyze Products' anyway.")
 
     # 4) Click the 'Analyze Products' button
     print("[info] Attempting to click 'Analyze Products'...")
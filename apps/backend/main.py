@@ -1,22 +1,43 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from typing import List, Optional
 import subprocess
 import json
+import logging
 import os
 import sys
 import pandas as pd
 import tempfile
+import functools
+import secrets
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # optional: faster dump of large payloads for logging
+except ImportError:
+    orjson = None
+
+# ORJSONResponse needs orjson at render time; fall back to the stdlib encoder
+_RESPONSE_CLASS = ORJSONResponse if orjson is not None else JSONResponse
 
 # from manual import process_manual_csv
 from pathlib import Path
 
 
 # Import scraper functions directly from current directory
-from main_loop import run_scraper_main, is_scraper_running, add_to_queue
+from main_loop import run_scraper_main, is_scraper_running, add_to_queue, get_queue_size
+
+logger = logging.getLogger(__name__)
+
+# One Chrome profile / CDP port backs every run, so scraper runs are serialized
+# on a single long-lived worker instead of a fresh thread per submission.
+_SCRAPER_EXEC = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scraper")
 
-app = FastAPI(title="Amazon Automation API", version="1.0.0")
+app = FastAPI(title="Amazon Automation API", version="1.0.0", default_response_class=_RESPONSE_CLASS)
 
 # CORS middleware
 app.add_middleware(
@@ -52,14 +73,152 @@ class SubmissionResponse(BaseModel):
     message: str
     payload: dict
 
-VALID_COUNTRIES = ["US", "UK", "CAN", "AUS", "DE", "UAE"]
+# Validates brands_data straight from JSON text in pydantic-core, with no
+# intermediate dict between parsing and validation.
+_REQ_ADAPTER = TypeAdapter(SubmissionRequest)
+
+def _json_pretty(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+UPLOAD_CHUNK_BYTES = 1 << 20  # 1 MiB per read when spooling CSV uploads to disk
+MAX_PARALLEL_UPLOADS = 8      # caps temp-file FDs open at once
+_UPLOAD_SEM = asyncio.Semaphore(MAX_PARALLEL_UPLOADS)
+
+_O_TMPFILE = getattr(os, "O_TMPFILE", 0)  # Linux only
+
+def _open_anonymous_tmp():
+    """Open an unnamed temp inode (O_TMPFILE); None where unsupported."""
+    if not _O_TMPFILE:
+        return None
+    try:
+        return os.open(tempfile.gettempdir(), _O_TMPFILE | os.O_WRONLY, 0o600)
+    except OSError:
+        return None  # e.g. filesystem without O_TMPFILE support
+
+def _link_anonymous_tmp(fd: int) -> str:
+    """Give a fully written O_TMPFILE inode a visible .csv name."""
+    tmp_dir = tempfile.gettempdir()
+    # Passing a dir fd makes os.link use linkat(AT_SYMLINK_FOLLOW); plain
+    # link() would try to hard-link the /proc symlink itself.
+    dir_fd = os.open(tmp_dir, os.O_RDONLY)
+    try:
+        while True:
+            name = f"tmp{secrets.token_hex(8)}.csv"
+            try:
+                os.link(f"/proc/self/fd/{fd}", name, dst_dir_fd=dir_fd)
+                return os.path.join(tmp_dir, name)
+            except FileExistsError:
+                continue
+    finally:
+        os.close(dir_fd)
+
+async def _save_upload(file: UploadFile, temp_files: List[str]):
+    """Spool one upload to a temp CSV; returns (filename, temp path)."""
+    async with _UPLOAD_SEM:
+        fd = _open_anonymous_tmp()
+        if fd is not None:
+            # The inode only gets a name once the copy has finished, so an
+            # aborted upload never leaves a partial CSV behind.
+            with os.fdopen(fd, "wb") as temp_file:
+                while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                    await run_in_threadpool(temp_file.write, chunk)
+                temp_file.flush()
+                path = _link_anonymous_tmp(temp_file.fileno())
+            temp_files.append(path)
+            return file.filename, path
+
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
+        temp_files.append(temp_file.name)
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                await run_in_threadpool(temp_file.write, chunk)
+        finally:
+            temp_file.close()
+        return file.filename, temp_file.name
+
+def _submission_response(message: str, payload: dict):
+    """SubmissionResponse-shaped body, encoded directly without a model round-trip."""
+    return _RESPONSE_CLASS({"ok": True, "message": message, "payload": payload})
 
+def _cleanup_temp_files(paths: List[str]):
+    """Best-effort removal of the temp CSVs spooled for one submission."""
+    for temp_file in paths:
+        try:
+            if os.path.exists(temp_file):
+                os.unlink(temp_file)
+                print(f"Cleaned up temporary file: {temp_file}")
+        except Exception as cleanup_error:
+            print(f"Failed to clean up {temp_file}: {cleanup_error}")
+
+def _log_scraper_result(fut, temp_files: Optional[List[str]] = None):
+    """Done-callback for a scraper run: report the outcome, then drop temp CSVs."""
+    try:
+        if fut.cancelled():
+            print("Scraper run cancelled")
+            return
+        exc = fut.exception()
+        if exc is not None:
+            print(f"Scraper error: {exc}")
+        else:
+            print("Scraper completed:", fut.result())
+    finally:
+        if temp_files:
+            _cleanup_temp_files(temp_files)
+
+def _start_scraper(payload: dict, temp_files: Optional[List[str]] = None):
+    """Queue a run on the single scraper worker without awaiting it."""
+    fut = asyncio.get_running_loop().run_in_executor(_SCRAPER_EXEC, run_scraper_main, payload)
+    fut.add_done_callback(lambda f: _log_scraper_result(f, temp_files))
+    return fut
+
+VALID_COUNTRIES = frozenset({"US", "UK", "CAN", "AUS", "DE", "UAE"})
+_ALIAS = {"AU": "AUS"}
+
+@functools.lru_cache(maxsize=32)
 def normalize_country(country_name: str) -> str:
     """Normalize country name to standard format"""
     country = country_name.strip().upper()
-    if country == "AU":
-        return "AUS"
-    return country
+    return _ALIAS.get(country, country)
+
+# Products in the plain JSON submission carry only the four scrape fields
+_DUMP_PRODUCTS = {"products"}
+_DUMP_EXCLUDE_CSV = {"products": {"__all__": {"csvFile"}}}
+
+def _build_payload(request: SubmissionRequest, csv_files_map: Optional[dict] = None) -> dict:
+    """Build the scraper payload, keeping only brands with at least one valid country.
+
+    With ``csv_files_map`` each product also carries ``csvFile`` and its temp
+    ``csvFilePath``.
+    """
+    valid, normalize = VALID_COUNTRIES, normalize_country
+    with_files = csv_files_map is not None
+    exclude = None if with_files else _DUMP_EXCLUDE_CSV
+    brands = []
+    for brand in request.brands:
+        # Filter country names first so invalid countries never dump products
+        valid_pairs = [(c, n) for c in brand.countries if (n := normalize(c.name)) in valid]
+        if not valid_pairs:
+            continue
+
+        valid_countries = []
+        for country, name in valid_pairs:
+            # model_dump allocates one fresh dict per product with the fields
+            # in payload order, so those dicts are used as-is
+            products = country.model_dump(include=_DUMP_PRODUCTS, exclude=exclude)["products"]
+            if with_files:
+                for product in products:
+                    csv_file = product["csvFile"]
+                    product["csvFilePath"] = csv_files_map.get(csv_file) if csv_file else None
+            valid_countries.append({"name": name, "products": products})
+
+        brands.append({
+            "brand": brand.brand,
+            "sellerType": brand.sellerType,
+            "countries": valid_countries
+        })
+    return {"brands": brands}
 
 @app.get("/health")
 async def health_check():
@@ -69,11 +228,9 @@ async def health_check():
 @app.get("/api/scraper-status")
 async def get_scraper_status():
     """Get current scraper status"""
-    from main_loop import get_queue
-    queue_items = get_queue()
     return {
         "running": is_scraper_running(),
-        "queue_size": len(queue_items)
+        "queue_size": get_queue_size()
     }
 
 @app.post("/api/submissions", response_model=SubmissionResponse)
@@ -85,40 +242,14 @@ async def create_submission(request: SubmissionRequest):
             raise HTTPException(status_code=400, detail="No brands provided")
 
         # Prepare payload for scraper
-        scraper_payload = {
-            "brands": []
-        }
-
-        for brand in request.brands:
-            # Filter valid countries
-            valid_countries = []
-            for country in brand.countries:
-                normalized_country = normalize_country(country.name)
-                if normalized_country in VALID_COUNTRIES:
-                    valid_countries.append({
-                        "name": normalized_country,
-                        "products": [
-                            {
-                                "productname": product.productname,
-                                "url": product.url,
-                                "keyword": product.keyword,
-                                "categoryUrl": product.categoryUrl
-                            }
-                            for product in country.products
-                        ]
-                    })
-
-            if valid_countries:
-                scraper_payload["brands"].append({
-                    "brand": brand.brand,
-                    "sellerType": brand.sellerType,
-                    "countries": valid_countries
-                })
+        scraper_payload = _build_payload(request)
 
         if not scraper_payload["brands"]:
             raise HTTPException(status_code=400, detail="No valid countries found")
 
-        print("Prepared scraper payload:", json.dumps(scraper_payload, indent=2))
+        print(f"Prepared scraper payload: {len(scraper_payload['brands'])} brand(s)")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Scraper payload: %s", _json_pretty(scraper_payload))
 
         # Check if scraper is already running
         if is_scraper_running():
@@ -126,37 +257,17 @@ async def create_submission(request: SubmissionRequest):
             
             # Add to queue
             if add_to_queue(scraper_payload):
-                return SubmissionResponse(
-                    ok=True,
-                    message="Data submitted to queue, will start processing once scraper is free",
-                    payload=scraper_payload
-                )
+                return _submission_response("Data submitted to queue, will start processing once scraper is free", scraper_payload)
             else:
                 raise HTTPException(status_code=500, detail="Failed to add to queue")
         else:
             # Start scraper in background
-            import threading
-            
-            def run_scraper_background():
-                try:
-                    print("Starting scraper in background...")
-                    result = run_scraper_main(scraper_payload)
-                    print("Scraper completed:", result)
-                except Exception as e:
-                    print(f"Scraper error: {e}")
-
-            # Start scraper in background thread
-            scraper_thread = threading.Thread(target=run_scraper_background)
-            scraper_thread.daemon = True
-            scraper_thread.start()
+            print("Starting scraper in background...")
+            _start_scraper(scraper_payload)
 
             print("Scraper started successfully in background")
             
-            return SubmissionResponse(
-                ok=True,
-                message="Scraper started successfully in the background",
-                payload=scraper_payload
-            )
+            return _submission_response("Scraper started successfully in the background", scraper_payload)
 
     except HTTPException:
         raise
@@ -170,13 +281,15 @@ async def create_submission_with_files(
     csv_files: List[UploadFile] = File(...)
 ):
     """Create a new submission with CSV files and start the scraper"""
+    temp_files = []
     try:
         # Parse the brands data
         try:
-            brands_json = json.loads(brands_data)
-            request = SubmissionRequest(**brands_json)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Invalid JSON in brands_data")
+            request = _REQ_ADAPTER.validate_json(brands_data)
+        except ValidationError as e:
+            if any(err["type"] == "json_invalid" for err in e.errors()):
+                raise HTTPException(status_code=400, detail="Invalid JSON in brands_data")
+            raise HTTPException(status_code=400, detail=f"Invalid brands data: {str(e)}")
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Invalid brands data: {str(e)}")
 
@@ -184,57 +297,26 @@ async def create_submission_with_files(
         if not request.brands:
             raise HTTPException(status_code=400, detail="No brands provided")
 
-        # Create a mapping of CSV files by their names and save them temporarily
-        csv_files_map = {}
-        temp_files = []
-        
-        for file in csv_files:
-            # Save the uploaded file to a temporary location
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
-            content = await file.read()
-            temp_file.write(content)
-            temp_file.close()
-            
-            csv_files_map[file.filename] = temp_file.name
-            temp_files.append(temp_file.name)
+        # Save the CSV files temporarily, all uploads at once; wait for every
+        # one to settle so no late writer adds a temp file after cleanup ran
+        saved = await asyncio.gather(
+            *(_save_upload(file, temp_files) for file in csv_files),
+            return_exceptions=True,
+        )
+        for item in saved:
+            if isinstance(item, BaseException):
+                raise item
+        csv_files_map = dict(saved)
 
         # Prepare payload for scraper
-        scraper_payload = {
-            "brands": []
-        }
-
-        for brand in request.brands:
-            # Filter valid countries
-            valid_countries = []
-            for country in brand.countries:
-                normalized_country = normalize_country(country.name)
-                if normalized_country in VALID_COUNTRIES:
-                    valid_countries.append({
-                        "name": normalized_country,
-                        "products": [
-                            {
-                                "productname": product.productname,
-                                "url": product.url,
-                                "keyword": product.keyword,
-                                "categoryUrl": product.categoryUrl,
-                                "csvFile": product.csvFile,
-                                "csvFilePath": csv_files_map.get(product.csvFile) if product.csvFile else None
-                            }
-                            for product in country.products
-                        ]
-                    })
-
-            if valid_countries:
-                scraper_payload["brands"].append({
-                    "brand": brand.brand,
-                    "sellerType": brand.sellerType,
-                    "countries": valid_countries
-                })
+        scraper_payload = _build_payload(request, csv_files_map)
 
         if not scraper_payload["brands"]:
             raise HTTPException(status_code=400, detail="No valid countries found")
 
-        print("Prepared scraper payload with CSV files:", json.dumps(scraper_payload, indent=2))
+        print(f"Prepared scraper payload with CSV files: {len(scraper_payload['brands'])} brand(s)")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Scraper payload: %s", _json_pretty(scraper_payload))
 
         # Check if scraper is already running
         if is_scraper_running():
@@ -243,71 +325,24 @@ async def create_submission_with_files(
             # For queued items, we need to ensure the CSV files are accessible
             # We'll store the file paths in the payload and let the scraper handle them
             if add_to_queue(scraper_payload):
-                return SubmissionResponse(
-                    ok=True,
-                    message="Data submitted to queue, will start processing once scraper is free",
-                    payload=scraper_payload
-                )
+                return _submission_response("Data submitted to queue, will start processing once scraper is free", scraper_payload)
             else:
-                # Clean up temporary files if queue addition failed
-                for temp_file in temp_files:
-                    try:
-                        if os.path.exists(temp_file):
-                            os.unlink(temp_file)
-                    except Exception:
-                        pass
+                # temp files are removed by the HTTPException handler below
                 raise HTTPException(status_code=500, detail="Failed to add to queue")
         else:
-            # Start scraper in background
-            import threading
-            
-            def run_scraper_background():
-                try:
-                    print("Starting scraper in background with CSV files...")
-                    result = run_scraper_main(scraper_payload)
-                    print("Scraper completed:", result)
-                except Exception as e:
-                    print(f"Scraper error: {e}")
-                finally:
-                    # Clean up temporary files
-                    for temp_file in temp_files:
-                        try:
-                            if os.path.exists(temp_file):
-                                os.unlink(temp_file)
-                                print(f"Cleaned up temporary file: {temp_file}")
-                        except Exception as cleanup_error:
-                            print(f"Failed to clean up {temp_file}: {cleanup_error}")
-
-            # Start scraper in background thread
-            scraper_thread = threading.Thread(target=run_scraper_background)
-            scraper_thread.daemon = True
-            scraper_thread.start()
+            # Start scraper in background; temp files go once the run settles
+            print("Starting scraper in background with CSV files...")
+            _start_scraper(scraper_payload, temp_files)
 
             print("Scraper started successfully in background")
             
-            return SubmissionResponse(
-                ok=True,
-                message="Scraper started successfully in the background with CSV files",
-                payload=scraper_payload
-            )
+            return _submission_response("Scraper started successfully in the background with CSV files", scraper_payload)
 
     except HTTPException:
-        # Clean up temporary files on HTTPException
-        for temp_file in temp_files:
-            try:
-                if os.path.exists(temp_file):
-                    os.unlink(temp_file)
-            except Exception:
-                pass
+        _cleanup_temp_files(temp_files)
         raise
     except Exception as e:
-        # Clean up temporary files on any exception
-        for temp_file in temp_files:
-            try:
-                if os.path.exists(temp_file):
-                    os.unlink(temp_file)
-            except Exception:
-                pass
+        _cleanup_temp_files(temp_files)
         print(f"Submission processing failed: {e}")
         raise HTTPException(status_code=500, detail=f"Submission processing failed: {str(e)}")
 
@@ -1,8 +1,8 @@
 # Launch.py
-import os, re, time, json
+import os, re, time, json, threading
 from typing import Dict, Any, List, Tuple
 from playwright.sync_api import Browser
-from helium_boot import boot_and_xray, _open_xray_via_extension, _open_xray_via_widget, _wait_for_xray_panel
+from helium_boot import boot_and_xray, retire_browser, _open_xray_via_extension, _open_xray_via_widget, _wait_for_xray_panel
 from getCategoryRev import get_category_revenue
 from competitors import run_competitors_flow
 from monthlyrev import run_monthlyrev
@@ -14,10 +14,18 @@ from sheet_writer import write_results_to_country_tabs
 from playwright.sync_api import TimeoutError as PWTimeout
 from datetime import datetime
 
+try:
+    import orjson  # optional: faster queue line encode/decode
+except ImportError:
+    orjson = None
+
 # ---------------------------
 # QUEUE MANAGEMENT
 # ---------------------------
-QUEUE_FILE = "queue.json"
+# Pending payloads, one JSON document per line: enqueue is a single O_APPEND
+# write instead of a read-modify-rewrite of the whole list.
+QUEUE_FILE = "queue.ndjson"
+LEGACY_QUEUE_FILE = "queue.json"  # pre-NDJSON list format, migrated on first use
 FAILED_QUEUE_FILE = "failed_queue.json"
 LOCK_FILE = "queue.lock"
 
@@ -27,18 +35,29 @@ queue_draining = False  # guard to avoid nested drains
 LOCK_TIMEOUT_SEC = 15
 LOCK_RETRY_MS = 100
 
+# In-process contenders (API threads vs. the scraper worker) queue up on this
+# mutex and are woken on release, instead of sleep-polling the lock file; the
+# lock file itself still guards against other processes.
+_QUEUE_MUTEX = threading.Lock()
+
 def _acquire_lock(timeout_sec: int = LOCK_TIMEOUT_SEC, retry_ms: int = LOCK_RETRY_MS):
     """Create a lock file exclusively; retry until timeout."""
     deadline = time.time() + timeout_sec
-    while True:
-        try:
-            fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_RDWR)
-            os.write(fd, str(os.getpid()).encode("utf-8"))
-            return fd
-        except FileExistsError:
-            if time.time() > deadline:
-                raise TimeoutError("[QUEUE] Could not acquire lock")
-            time.sleep(retry_ms / 1000.0)
+    if not _QUEUE_MUTEX.acquire(timeout=timeout_sec):
+        raise TimeoutError("[QUEUE] Could not acquire lock")
+    try:
+        while True:
+            try:
+                fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_RDWR)
+                os.write(fd, str(os.getpid()).encode("utf-8"))
+                return fd
+            except FileExistsError:
+                if time.time() > deadline:
+                    raise TimeoutError("[QUEUE] Could not acquire lock")
+                time.sleep(retry_ms / 1000.0)
+    except BaseException:
+        _QUEUE_MUTEX.release()
+        raise
 
 
 def _release_lock(fd: int):
@@ -50,6 +69,8 @@ def _release_lock(fd: int):
             os.remove(LOCK_FILE)
         except FileNotFoundError:
             pass
+        finally:
+            _QUEUE_MUTEX.release()
 
 
 def _safe_read_json(path: str):
@@ -80,18 +101,69 @@ def set_scraper_running(status: bool):
     scraper_running = status
 
 
+def _dumps_line(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _loads_line(line: bytes):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def _read_queue_lines(path: str = QUEUE_FILE) -> List[bytes]:
+    """Raw non-blank lines of the NDJSON queue (no decoding)."""
+    try:
+        with open(path, "rb") as f:
+            return [line for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _migrate_legacy_queue():
+    """
+    Move items from the old queue.json list to the front of the NDJSON queue (they were queued
+    first). Caller holds the lock. A queue.json that doesn't parse is left in place, not dropped.
+    """
+    if not os.path.exists(LEGACY_QUEUE_FILE):
+        return
+    try:
+        with open(LEGACY_QUEUE_FILE, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        if not isinstance(items, list):
+            raise ValueError(f"expected a list, got {type(items).__name__}")
+    except Exception as e:
+        print(f"[QUEUE ERROR] Not migrating unreadable {LEGACY_QUEUE_FILE}: {e}")
+        return
+    if items:
+        lines = _read_queue_lines()
+        tmp = f"{QUEUE_FILE}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(b"".join(_dumps_line(item) for item in items))
+            f.writelines(lines)
+        os.replace(tmp, QUEUE_FILE)  # atomic on same filesystem
+        print(f"[QUEUE] Migrated {len(items)} item(s) from {LEGACY_QUEUE_FILE}")
+    os.remove(LEGACY_QUEUE_FILE)
+
+
 def add_to_queue(payload: Dict[str, Any]):
     """Append payload atomically under lock."""
     try:
         fd = _acquire_lock()
         try:
-            queue_data = _safe_read_json(QUEUE_FILE)
+            _migrate_legacy_queue()
             # optional: initialize a retry counter if you want later
             if "retries" not in payload:
                 payload["retries"] = 0
-            queue_data.append(payload)
-            _safe_write_json(QUEUE_FILE, queue_data)
-            print(f"[QUEUE] Added payload. New size: {len(queue_data)}")
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+            qfd = os.open(QUEUE_FILE, flags, 0o644)
+            try:
+                os.write(qfd, _dumps_line(payload))
+            finally:
+                os.close(qfd)
+            print(f"[QUEUE] Added payload. New size: {get_queue_size()}")
             return True
         finally:
             _release_lock(fd)
@@ -103,22 +175,50 @@ def add_to_queue(payload: Dict[str, Any]):
 def get_queue():
     """Read current queue (non-locking read for informational purposes)."""
     try:
-        return _safe_read_json(QUEUE_FILE)
+        # not yet migrated items still count (process_queue peeks via this)
+        items = _safe_read_json(LEGACY_QUEUE_FILE)
+        for line in _read_queue_lines():
+            try:
+                items.append(_loads_line(line))
+            except ValueError:
+                continue  # torn/corrupt line; skip rather than drop the queue
+        return items
     except Exception as e:
         print(f"[QUEUE ERROR] Failed to read queue: {e}")
         return []
 
 
+def get_queue_size() -> int:
+    """Number of queued payloads, counted by line without decoding any of them."""
+    try:
+        size = len(_safe_read_json(LEGACY_QUEUE_FILE)) if os.path.exists(LEGACY_QUEUE_FILE) else 0
+        with open(QUEUE_FILE, "rb") as f:
+            return size + sum(1 for line in f if line.strip())
+    except FileNotFoundError:
+        return size
+    except Exception as e:
+        print(f"[QUEUE ERROR] Failed to read queue size: {e}")
+        return 0
+
+
 def _pop_next_queue_item():
     """Atomically pop the next item from the queue (FIFO). Returns None if empty."""
     fd = _acquire_lock()
     try:
-        queue_data = _safe_read_json(QUEUE_FILE)
-        if not queue_data:
-            return None
-        item = queue_data.pop(0)
-        if queue_data:
-            _safe_write_json(QUEUE_FILE, queue_data)
+        _migrate_legacy_queue()
+        lines = _read_queue_lines()
+        item = None
+        while lines and item is None:
+            try:
+                item = _loads_line(lines.pop(0))
+            except ValueError:
+                print("[QUEUE] Skipping corrupt queue line")
+        if lines:
+            # remaining lines are written back verbatim, no re-encoding
+            tmp = f"{QUEUE_FILE}.tmp"
+            with open(tmp, "wb") as f:
+                f.writelines(lines)
+            os.replace(tmp, QUEUE_FILE)  # atomic on same filesystem
         else:
             # queue now empty; remove file to avoid stale re-reads
             try:
@@ -146,9 +246,10 @@ def _push_failed_item(payload: Dict[str, Any], err_msg: str):
 def clear_queue():
     """Remove queue file (rarely needed now)."""
     try:
-        if os.path.exists(QUEUE_FILE):
-            os.remove(QUEUE_FILE)
-            print("[QUEUE] Queue cleared")
+        for path in (QUEUE_FILE, LEGACY_QUEUE_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+                print("[QUEUE] Queue cleared")
         return True
     except Exception as e:
         print(f"[QUEUE ERROR] Failed to clear queue: {e}")
@@ -168,7 +269,7 @@ def process_queue():
         failed = 0
 
         # quick peek for log
-        initial = len(get_queue())
+        initial = get_queue_size()
         if initial == 0:
             print("[QUEUE] No items in queue to process")
             return
@@ -428,14 +529,8 @@ def run_single_product(
                     [p.close() for p in ctx.pages]
                 except Exception:
                     pass
-                try:
-                    browser.close()
-                except Exception:
-                    pass
-                try:
-                    pw.stop()
-                except Exception:
-                    pass
+                # drop the pooled connection so boot_and_xray starts over on a fresh one
+                retire_browser(browser)
 
                 pw, browser, ctx, _ = boot_and_xray(
                     chrome_path=CHROME_PATH,
@@ -611,16 +706,7 @@ def run_single_product(
         except Exception:
             pass
 
-    # teardown for this product
-    try:
-        browser.close()
-    except Exception:
-        pass
-    try:
-        pw.stop()
-    except Exception:
-        pass
-
+    # the pooled connection and the shared Playwright driver stay up for the next product's boot_and_xray
     return run_results
 
 
@@ -1,27 +1,38 @@
 import os
-from typing import Dict, Any, List, Optional
+import math
+import random
+import functools
+from typing import Dict, Any, List, Optional, Union
 import pandas as pd
 import threading
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from helium_boot import _find_free_port, _cdp_ready
+from helium_boot import _ensure_chrome_running, _wake_extension, get_playwright, shutdown_chrome
 from dotenv import load_dotenv, find_dotenv
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from manual_csv_picker import find_top_recent_product
-from pathlib import Path
-import sys
-import subprocess
+from manual_csv_picker import _to_number, find_top_recent_product, find_top_recent_product_stream, load_csv
 import time
-from playwright.sync_api import sync_playwright
-from profitcal import get_profitability_metrics
 from main_loop import get_configg
-from sheet_writer import _hyper, _sheets_service, _get_sheet_id_and_cols,get_sheets_config
+from sheet_writer import _hyper, _black_bg_white_font_requests, _col_runs, get_sheets_config
+# google-api-python-client / google-auth and profitcal (-> playwright.sync_api) are imported where
+# first used, so importing this module stays cheap until a run actually touches Sheets or Chrome
+
+__all__ = [
+    "SheetCtx",
+    "sheet_ctx_for",
+    "normalize_currency",
+    "open_browser",
+    "close_browser",
+    "fill_in_row_with_new_values_for_country",
+    "find_competitor_data",
+    "process_manual_csv",
+    "process_multiple_manually",
+]
 
 # Load .env (override current env if present)
 load_dotenv(find_dotenv(), override=True)
 
 # === ENV ===
-SPREADSHEET_ID = None
 EXISTING_SELLER_SPREADSHEET_ID = os.getenv("EXISTING_SELLER_SPREADSHEET_ID", "").strip()
 NEW_SELLER_SPREADSHEET_ID= os.getenv("NEW_SELLER_SPREADSHEET_ID", "").strip()
 VENDOR_SPREADSHEET_ID=os.getenv("VENDOR_SPREADSHEET_ID", "").strip()
@@ -37,122 +48,164 @@ COL_YOUR_PRICE          = 9
 COL_FBA_FEES            = 11
 COL_STORAGE_FEES = 13
 SCOPES,  ROW_WIDTH = get_sheets_config()
+# Runs processed at once, each on its own CDP connection. Sheet state is per run (SheetCtx), so the
+# CSV pick and Sheets reads/writes of different runs overlap; the Helium calculator is one shared
+# Chrome window and is serialized by profitcal.CALCULATOR_LOCK
+MAX_MANUAL_WORKERS = 4
+# Sheets calls (_execute) back off on these: min(cap, 2**attempt) + jitter, or the server's Retry-After
+SHEETS_RETRY_STATUSES = frozenset({429, 500, 502, 503})
+SHEETS_MAX_ATTEMPTS = 6
+SHEETS_BACKOFF_CAP_S = 90
+# Attempts at a whole competitor lookup, backing off 1s, 2s, 4s ... capped at this, plus jitter
+COMPETITOR_MAX_RETRIES = 8
+COMPETITOR_BACKOFF_MAX_S = 30
+# Between calculator attempts inside one lookup: 0.2s, 0.4s ... capped at 2s, with half of it jittered
+# so the pool's workers don't re-hit the calculator in lockstep
+CALCULATOR_BACKOFF_INITIAL_S = 0.1
+CALCULATOR_BACKOFF_MAX_S = 2.0
+
+
+@dataclass(frozen=True)
+class SheetCtx:
+    """Target spreadsheet and column layout for one (seller_type, country) run."""
+    spreadsheet_id: str
+    competitor_col: int
+    comp_mrev_col: int
+    your_price_col: int
+    fba_fees_col: int
+    storage_fees_col: int
+
+
+def _spreadsheet_id_for(seller_type: str) -> str:
+    if seller_type == 'new_seller':
+        return NEW_SELLER_SPREADSHEET_ID
+    if seller_type == 'existing_seller':
+        return EXISTING_SELLER_SPREADSHEET_ID
+    return VENDOR_SPREADSHEET_ID
+
+
+def sheet_ctx_for(seller_type: str, country: str) -> SheetCtx:
+    """Spreadsheet and competitor / price / fee columns used by each seller type's sheets."""
+    price, fba, storage = COL_YOUR_PRICE, COL_FBA_FEES, COL_STORAGE_FEES
+    if seller_type == 'existing_seller':
+        if country not in ["US", "CAN", "AUS"]:
+            fba, storage = fba + 1, storage + 1
+    elif seller_type == 'vendor':
+        if country in ['US', 'CAN']:
+            fba, storage = fba + 2, storage + 2
+        else:
+            storage += 3
+    else:     #new_seller
+        if country not in ["US", "CAN", "AUS"]:
+            price, fba, storage = price - 2, fba - 1, storage - 1
+        else:
+            price, fba, storage = price - 2, fba - 2, storage - 2
+
+    if seller_type != 'new_seller':
+        competitor, comp_mrev = COL_YOUR_COMPETITOR, COL_COMP_MREV
+    else:
+        competitor, comp_mrev = COL_PRODUCTS + 1, COL_PRODUCTS + 2
+    return SheetCtx(_spreadsheet_id_for(seller_type), competitor, comp_mrev, price, fba, storage)
+
+# Currency symbols seen in Helium calculator amounts; CA$ before A$ before $ so the longest wins
+_CURRENCY_SYMBOLS = ("CA$", "A$", "AED", "€", "£", "$")
+
+class _KeepNumChars(dict):
+    """str.translate table that drops every character except digits, '.' and ','."""
+    def __missing__(self, codepoint):
+        return None
+
+_KEEP_NUM = _KeepNumChars({ord(c): c for c in "0123456789.,"})
 
-AFFECTED_COLS = [COL_YOUR_PRICE,COL_FBA_FEES,COL_STORAGE_FEES]
-ORIGINAL_COL_YOUR_PRICE = COL_YOUR_PRICE
-ORIGINAL_COL_FBA_FEES = COL_FBA_FEES
-ORIGINAL_COL_STORAGE_FEES = COL_STORAGE_FEES
 # === Google Sheets Helpers ===
 
-def _read_row(svc, title: str, row_number: int) -> List[str]:
-    """Read a specific row from the sheet (1-based row number)."""
-    rng = f"{title}!A{row_number}:Z{row_number}"  # Read columns A-Z
-    r = svc.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=rng).execute()
-    values = r.get("values", [])
-    if not values:
-        return []
-    
-    # Pad the row to at least 32 columns
-    row_data = values[0]
-    while len(row_data) < 32:
-        row_data.append("")
-    
-    return row_data
+def _read_row(svc, spreadsheet_id: str, title: str, row_number: int, cols: List[int]) -> Dict[int, str]:
+    """Read the given 0-based columns of a row (1-based row number) as {col: value}, "" when blank."""
+    lo, hi = min(cols), max(cols)
+    # Only the span the caller needs (min..max column), in one values.batchGet
+    rng = f"{title}!{_num_to_col(lo)}{row_number}:{_num_to_col(hi)}{row_number}"
+    r = _execute(svc.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id, ranges=[rng], majorDimension="ROWS",
+    ))
+    rows = (r.get("valueRanges") or [{}])[0].get("values") or [[]]
+    row_data = rows[0]
+    return {c: (row_data[c - lo] if c - lo < len(row_data) else "") for c in cols}
 
 def normalize_currency(d):
-    import re
-    currency_pattern = re.compile(r"(A\$|CA\$|AED|€|£|\$)") # Regex to capture currency symbols/letters
-    currency = None
-    for v in d.values():
-        m = currency_pattern.search(v["text"])
-        if m:
-            currency = m.group(1)
-            break
-    if not currency:
-        currency = "$"  # default fallback
+    currency = next(
+        (sym for v in d.values() for sym in _CURRENCY_SYMBOLS if sym in v["text"]),
+        "$",  # default fallback
+    )
     
     # Normalize each field
     for k, v in d.items():
         # Replace commas with dots, strip spaces
-        num_str = re.sub(r"[^\d.,]", "", v["text"]).replace(",", ".")
+        num_str = v["text"].translate(_KEEP_NUM).replace(",", ".")
         if not num_str:  # fallback to number field if text was empty
             num_str = v["number"]
         v["text"] = f"{currency}{num_str}"
 
     return d
     
+# Open connections per (thread, cdp_port): {"browser", "ctx", "pw", "refs"}. Later open_browser
+# calls reuse the connection and skip the extension wake-up; close_browser disconnects on the last ref.
+# Keyed by thread because sync Playwright objects can't cross threads.
+_BROWSERS = {}
+_BROWSERS_LOCK = threading.Lock()
+
 def open_browser(chrome_path, user_data_dir, profile_dir, cdp_port, ext_id, popup_visible=False):
     #open browser
-    chrome = Path(chrome_path)
-    if not chrome.exists():
-        raise FileNotFoundError(f"Chrome not found: {chrome_path}")
-
-    udd = Path(user_data_dir); udd.mkdir(parents=True, exist_ok=True)
-
-    if cdp_port is None:
-        cdp_port = _find_free_port()
-
-    if not _cdp_ready(cdp_port):
-        print(f"[info] Launching Chrome on port {cdp_port}...")
-        args = [
-            str(chrome),
-            f"--remote-debugging-port={cdp_port}",
-            f"--user-data-dir={user_data_dir}",
-            f"--profile-directory={profile_dir}",
-            "--no-first-run",
-            "--no-default-browser-check",
-            "about:blank",
-        ]
-        creationflags = 0
-        if sys.platform.startswith("win"):
-            creationflags = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
-        subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=creationflags)
-
-        deadline = time.time() + 25
-        while time.time() < deadline and not _cdp_ready(cdp_port):
-            time.sleep(0.2)
-        if not _cdp_ready(cdp_port):
-            raise TimeoutError(f"CDP not ready on 127.0.0.1:{cdp_port}")
-        print(f"[info] Chrome launched and CDP ready on {cdp_port}")
-    else:
-        print(f"[info] Reusing existing Chrome CDP on {cdp_port}")
+    cdp_port, _ = _ensure_chrome_running(chrome_path, user_data_dir, profile_dir, cdp_port)
+    key = (threading.get_ident(), cdp_port)
 
-    cdp_url  = f"http://127.0.0.1:{cdp_port}"
-    popup_url = f"chrome-extension://{ext_id}/popup.html"
+    with _BROWSERS_LOCK:
+        entry = _BROWSERS.get(key)
+        if entry is not None:
+            try:
+                connected = entry["browser"].is_connected()
+            except Exception:
+                connected = False
+            if connected:
+                entry["refs"] += 1
+                return entry["browser"], entry["ctx"], entry["pw"]
+            del _BROWSERS[key]
 
-    print("[info] Connecting Playwright to Chrome...")
-    pw = sync_playwright().start()
-    browser = pw.chromium.connect_over_cdp(cdp_url)
-    ctx = browser.contexts[0] if browser.contexts else browser.new_context()
+        cdp_url  = f"http://127.0.0.1:{cdp_port}"
 
-    # Open extension popup just to send the message
-    popup = ctx.new_page()
-    popup.goto(popup_url, wait_until="domcontentloaded")
-    print("[info] Opened Helium popup (transient).")
+        print("[info] Connecting Playwright to Chrome...")
+        pw = get_playwright()
+        browser = pw.chromium.connect_over_cdp(cdp_url)
+        ctx = browser.contexts[0] if browser.contexts else browser.new_context()
+
+        _wake_extension(ctx, ext_id, popup_visible=popup_visible)
+        _BROWSERS[key] = {"browser": browser, "ctx": ctx, "pw": pw, "refs": 1}
 
-    if not popup_visible:
-        try:
-            popup.close()
-            print("[info] Closed Helium popup tab (minimal UI).")
-        except Exception:
-            pass
-    
     return browser, ctx, pw
 
 def close_browser(browser, ctx, pw):
-    try:
-        if ctx:
-            ctx.close()
-        if browser:
-            browser.close()
-    finally:
-        if pw:
-            pw.stop()
-
-def _sheets_service():
-    if not (SPREADSHEET_ID and GOOGLE_CLIENT_EMAIL and GOOGLE_PRIVATE_KEY):
-        raise RuntimeError("Missing SPREADSHEET_ID / GOOGLE_CLIENT_EMAIL / GOOGLE_PRIVATE_KEY.")
-    creds = service_account.Credentials.from_service_account_info(
+    # Disconnect only. Chrome, its default context (Helium login / extension state) and the shared
+    # driver (helium_boot.get_playwright) all stay up for the next run; see shutdown_chrome
+    with _BROWSERS_LOCK:
+        for key, entry in list(_BROWSERS.items()):
+            if entry["browser"] is browser:
+                entry["refs"] -= 1
+                if entry["refs"] > 0:
+                    return  # still in use by another open_browser caller
+                del _BROWSERS[key]
+                break
+    if browser:
+        browser.close()  # over CDP this just drops the connection
+
+# googleapiclient services sit on an httplib2.Http, which is not thread-safe,
+# so each thread builds its service once and keeps it
+_SVC_LOCAL = threading.local()
+
+@functools.lru_cache(maxsize=1)
+def _get_creds():
+    """Service-account credentials, built once (PEM parse + signer) and shared by every thread's service."""
+    from google.oauth2 import service_account
+
+    return service_account.Credentials.from_service_account_info(
         {
             "type": "service_account",
             "client_email": GOOGLE_CLIENT_EMAIL,
@@ -161,19 +214,154 @@ def _sheets_service():
         },
         scopes=SCOPES,
     )
-    return build("sheets", "v4", credentials=creds)
 
-def _get_sheet_id_and_cols(svc, title: str):
-    meta = svc.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-    for sh in meta.get("sheets", []):
-        props = sh.get("properties", {})
-        if props.get("title") == title:
+def _sheets_service(spreadsheet_id: str):
+    if not (spreadsheet_id and GOOGLE_CLIENT_EMAIL and GOOGLE_PRIVATE_KEY):
+        raise RuntimeError("Missing SPREADSHEET_ID / GOOGLE_CLIENT_EMAIL / GOOGLE_PRIVATE_KEY.")
+    svc = getattr(_SVC_LOCAL, "svc", None)
+    if svc is None:
+        from googleapiclient.discovery import build
+
+        # static_discovery uses the discovery doc bundled with the client (no HTTPS fetch)
+        svc = build("sheets", "v4", credentials=_get_creds(), cache_discovery=False, static_discovery=True)
+        _SVC_LOCAL.svc = svc
+    return svc
+
+def _retry_after_s(e) -> Optional[float]:
+    try:
+        return float(e.resp.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def _execute(request):
+    """request.execute(), retried on SHEETS_RETRY_STATUSES with capped exponential backoff + jitter."""
+    from googleapiclient.errors import HttpError
+
+    for attempt in range(SHEETS_MAX_ATTEMPTS):
+        try:
+            return request.execute()
+        except HttpError as e:
+            status = getattr(e.resp, "status", None)
+            if status is None or int(status) not in SHEETS_RETRY_STATUSES or attempt == SHEETS_MAX_ATTEMPTS - 1:
+                raise
+            wait_s = _retry_after_s(e)
+            if wait_s is None:
+                wait_s = min(SHEETS_BACKOFF_CAP_S, 2 ** attempt) + random.random()
+            print(f"[SHEETS] HTTP {status}, retrying in {wait_s:.1f}s")
+            time.sleep(wait_s)
+
+# {spreadsheet_id: {title: (sheet_id, column_count, row_count)}}; tab layout is static during a run
+# apart from rows appended here, which _bump_row_count accounts for
+_SHEET_META: Dict[str, Dict[str, tuple]] = {}
+_SHEET_META_LOCK = threading.Lock()
+# Only what _SHEET_META keeps; without a mask spreadsheets.get returns every tab's merges, formats, etc.
+_SHEET_META_FIELDS = "sheets.properties(title,sheetId,gridProperties(columnCount,rowCount))"
+
+def _sheet_tabs(svc, spreadsheet_id: str, refresh: bool = False) -> Dict[str, tuple]:
+    """Tab metadata for a spreadsheet, fetched once and then served from cache."""
+    with _SHEET_META_LOCK:
+        tabs = _SHEET_META.get(spreadsheet_id)
+    if tabs is None or refresh:
+        meta = _execute(svc.spreadsheets().get(
+            spreadsheetId=spreadsheet_id, fields=_SHEET_META_FIELDS,
+        ))
+        tabs = {}
+        for sh in meta.get("sheets", []):
+            props = sh.get("properties", {})
             grid = props.get("gridProperties", {}) or {}
-            return props.get("sheetId"), grid.get("columnCount", ROW_WIDTH)
+            tabs[props.get("title")] = (props.get("sheetId"), grid.get("columnCount", ROW_WIDTH), grid.get("rowCount"))
+        with _SHEET_META_LOCK:
+            _SHEET_META[spreadsheet_id] = tabs
+    return tabs
+
+def _get_sheet_id_and_cols(svc, spreadsheet_id: str, title: str):
+    """(sheetId, columnCount, rowCount) for a tab."""
+    # A miss may mean the tab was added mid-run, so refetch once before giving up
+    for refresh in (False, True):
+        tabs = _sheet_tabs(svc, spreadsheet_id, refresh=refresh)
+        if title in tabs:
+            return tabs[title]
     raise ValueError(f'Sheet/tab "{title}" not found.')
 
+def _bump_row_count(spreadsheet_id: str, title: str, row_count: int):
+    """Record a tab's new rowCount after appending rows to it."""
+    with _SHEET_META_LOCK:
+        tabs = _SHEET_META.get(spreadsheet_id, {})
+        if title in tabs:
+            sheet_id, col_count, _ = tabs[title]
+            tabs[title] = (sheet_id, col_count, row_count)
+
+def _user_entered_value(v) -> Dict[str, Any]:
+    """
+    ExtendedValue for v. updateCells doesn't parse like USER_ENTERED did, so numbers in the forms
+    this module writes (3.42, '$12,345.67', '83,091.29', '(12.50)') are parsed here and sent
+    as numberValue; the cell keeps its own number format.
+    """
+    if isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v):
+        return {"numberValue": v}
+    s = str(v)
+    if s.startswith("="):
+        return {"formulaValue": s}   # e.g. the competitor =HYPERLINK(...)
+    num = _to_number(s)   # strips $ and thousands separators, (x) -> -x
+    if num is not None and math.isfinite(num):
+        return {"numberValue": num}
+    return {"stringValue": s}
+
+
+def _row_requests(tab: tuple, row, column_indices, row_number, corresp_nums):
+    """
+    batchUpdate requests that write and format one row of tab ((sheetId, columnCount, rowCount) from
+    _get_sheet_id_and_cols), plus the tab's rowCount once they have run (None when the row is
+    already inside the grid).
+    """
+    sheet_id, col_count, row_count = tab
+    
+    # Convert row number to 0-based for formatting
+    row0 = row_number - 1
+    
+    # Values + formatting go out in one spreadsheets.batchUpdate
+    requests = []
+    grown_to = None
+    if row_count is not None and row_number > row_count:
+        # updateCells can't write past the grid, so grow it in the same batch
+        print(f"Row {row_number} is past the grid - appending rows first")
+        requests.append({"appendDimension": {"sheetId": sheet_id, "dimension": "ROWS",
+                                             "length": row_number - row_count}})
+        grown_to = row_number
+    
+    # Write the specific columns to the existing row
+    # We need to write only the columns that have data
+    cells = {}
+    for i, col_idx in enumerate(column_indices):
+        # print(f"col_idx: {col_idx}", len(row), row[col_idx])
+        if not (col_idx < len(row) and row[col_idx]):  # Only write non-empty values
+            continue
+        if corresp_nums is None:
+            val = row[col_idx]
+        else:
+            # the numeric value is already known, write it as-is
+            val = corresp_nums[i]
+        if val == "":
+            continue
+        print(f"writing value: @ col_idx={col_idx} .................... {val}")
+        cells[col_idx] = val
+    # one updateCells per run of adjacent columns (e.g. competitor + MREV go out together)
+    for start_col, end_col in _col_runs(list(cells)):
+        requests.append({
+            "updateCells": {
+                "rows": [{"values": [{"userEnteredValue": _user_entered_value(cells[c])}
+                                     for c in range(start_col, end_col)]}],
+                "fields": "userEnteredValue",
+                "start": {"sheetId": sheet_id, "rowIndex": row0, "columnIndex": start_col},
+            }
+        })
+
+    # Format the written columns with black background and white text
+    # (adjacent columns are merged into one repeatCell range)
+    requests.extend(_black_bg_white_font_requests(sheet_id, row0, row0 + 1, column_indices))
+    return requests, grown_to
 
-def fill_in_row_with_new_values_for_country(row, column_indices, country, row_number,seller_type,corresp_nums):
+def fill_in_row_with_new_values_for_country(row, column_indices, country, row_number,seller_type,corresp_nums, ctx: Optional[SheetCtx] = None):
     """
     Write data to specific columns in an existing row and format them with black background and white text.
     
@@ -182,143 +370,21 @@ def fill_in_row_with_new_values_for_country(row, column_indices, country, row_nu
         column_indices: List of column indices to write and format
         country: Country sheet name (e.g., "US", "UK", etc.)
         row_number: 1-based row number to write to
+        ctx: SheetCtx for this run (defaults to sheet_ctx_for(seller_type, country))
     """
-    global SPREADSHEET_ID
-
     try:
-        if seller_type == 'new_seller':
-            SPREADSHEET_ID = NEW_SELLER_SPREADSHEET_ID
-        elif seller_type == 'existing_seller':
-            SPREADSHEET_ID = EXISTING_SELLER_SPREADSHEET_ID
-        else:
-            SPREADSHEET_ID = VENDOR_SPREADSHEET_ID
-        print("Updated Spread sheet id to ",SPREADSHEET_ID)
-        svc = _sheets_service()
-        
-        # Get sheet metadata
-        sheet_id, col_count = _get_sheet_id_and_cols(svc, country)
-        
-        # Convert row number to 0-based for formatting
-        row0 = row_number - 1
-        
-        # Check if the row exists by trying to read it
-        try:
-            test_range = f"{country}!A{row_number}:A{row_number}"
-            test_result = svc.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=test_range).execute()
-            row_exists = len(test_result.get("values", [])) > 0
-        except Exception:
-            row_exists = False
-        
-        # If row doesn't exist, we need to ensure it exists by writing to it first
-        if not row_exists:
-            print(f"Row {row_number} doesn't exist - creating it first")
-            # Write an empty row to create it
-            empty_row = [""] * ROW_WIDTH
-            last_col_letter = _num_to_col(ROW_WIDTH - 1)
-            create_range = f"{country}!A{row_number}:{last_col_letter}{row_number}"
-            svc.spreadsheets().values().update(
-                spreadsheetId=SPREADSHEET_ID,
-                range=create_range,
-                valueInputOption="USER_ENTERED",
-                body={"values": [empty_row]},
-            ).execute()
-            print(f"Created row {row_number} in '{country}' sheet")
-        
-        # Write the specific columns to the existing row
-        # We need to write only the columns that have data
-        i=0
-        for i,col_idx in enumerate(column_indices):
-            # print(f"col_idx: {col_idx}", len(row), row[col_idx])
-            if col_idx < len(row) and row[col_idx]:  # Only write non-empty values
-                # Convert column index to letter (A, B, C, etc.)
-                col_letter = _num_to_col(col_idx)
-                cell_range = f"{country}!{col_letter}{row_number}"
-                # # Write the value
-                if corresp_nums is None:
-                    print(f"writing value: {row[col_idx]}")
-                    svc.spreadsheets().values().update(
-                        spreadsheetId=SPREADSHEET_ID,
-                        range=cell_range,
-                        valueInputOption="USER_ENTERED",
-                        body={"values": [[row[col_idx]]]},
-                    ).execute()
-                    continue
-
-                raw_val = row[col_idx]
-                # print(f"raw_val: {raw_val}")
-
-            # --- detect numeric part + currency symbol ---
-            if seller_type == 'vendor':
-                if i == 1:      #fba fees
-                    continue
-            import re
-            m = re.match(r"([A-Za-z$€£]+)?\s*([\d.,]+)", str(raw_val))
-            # print(f"m: {m}")
-            if m:
-                currency, _ = m.groups()
-            else:
-                currency, _ = "", raw_val
-            
-            if corresp_nums is not None:
-                num_val = corresp_nums[i]
-
-            # print(f"num_val: {num_val}", f"currency: {currency}")
-            # --- write numeric value ---
-            print(f"writing value: @ col_idx={col_idx} .................... {num_val}")
-            svc.spreadsheets().values().update(
-                spreadsheetId=SPREADSHEET_ID,
-                range=cell_range,
-                valueInputOption="USER_ENTERED",
-                body={"values": [[num_val]]},
-            ).execute()
-
-            # --- format as currency if symbol detected ---
-            # if currency:
-            #     # map symbol/prefix → Google Sheets currency codes
-            #     cur_map = {
-            #         "€": "€",
-            #         "$": "$",
-            #         "A$": "$",
-            #         "CA$": "$",
-            #         "AED": "dh",
-            #         "£": "£",
-            #     }
-
-            #     cur_code = cur_map.get(currency, None)
-            #     print(f"cur_code: {cur_code}")
-            #     if cur_code:
-            #         svc.spreadsheets().batchUpdate(
-            #             spreadsheetId=SPREADSHEET_ID,
-            #             body={
-            #                 "requests": [
-            #                     {
-            #                         "repeatCell": {
-            #                             "range": {
-            #                                 "sheetId": sheet_id,
-            #                                 "startRowIndex": row0,
-            #                                 "endRowIndex": row0 + 1,
-            #                                 "startColumnIndex": col_idx,
-            #                                 "endColumnIndex": col_idx + 1,
-            #                             },
-            #                             "cell": {
-            #                                 "userEnteredFormat": {
-            #                                     "numberFormat": {
-            #                                         "type": "CURRENCY",
-            #                                         "pattern": f'[${cur_code}] #,##0.00',
-            #                                     }
-            #                                 }
-            #                             },
-            #                             "fields": "userEnteredFormat.numberFormat",
-            #                         }
-            #                     }
-            #                 ]
-            #             },
-            #         ).execute()
-            i+=1
-        
-        
-        # Format the written columns with black background and white text
-        _format_cells_black_bg_white_font(svc, sheet_id, row0=row0, col_indices=column_indices)
+        if ctx is None:
+            ctx = sheet_ctx_for(seller_type, country)
+        print("Writing to spreadsheet ",ctx.spreadsheet_id)
+        svc = _sheets_service(ctx.spreadsheet_id)
+        tab = _get_sheet_id_and_cols(svc, ctx.spreadsheet_id, country)
+        requests, grown_to = _row_requests(tab, row, column_indices, row_number, corresp_nums)
+        _execute(svc.spreadsheets().batchUpdate(
+            spreadsheetId=ctx.spreadsheet_id,
+            body={"requests": requests}
+        ))
+        if grown_to is not None:
+            _bump_row_count(ctx.spreadsheet_id, country, grown_to)
         
         print(f"[SHEETS] Updated row {row_number} in '{country}' sheet with columns {column_indices}")
         
@@ -326,7 +392,7 @@ def fill_in_row_with_new_values_for_country(row, column_indices, country, row_nu
         print(f"Error filling row with new values: {e}")
         raise
 
-def _num_to_col(n0: int) -> str:
+def _col_letters(n0: int) -> str:
     """Convert 0-based column index to letter (A, B, C, etc.)"""
     n = n0 + 1
     s = ""
@@ -335,51 +401,179 @@ def _num_to_col(n0: int) -> str:
         s = chr(65 + rem) + s
     return s
 
-def _format_cells_black_bg_white_font(svc, sheet_id: int, row0: int, col_indices: List[int]):
-    """Set background black + font white for specific cells (one row)."""
-    requests = []
-    for c in col_indices:
-        requests.append({
-            "repeatCell": {
-                "range": {
-                    "sheetId": sheet_id,
-                    "startRowIndex": row0,
-                    "endRowIndex": row0 + 1,
-                    "startColumnIndex": c,
-                    "endColumnIndex": c + 1,
-                },
-                "cell": {
-                    "userEnteredFormat": {
-                        "backgroundColor": {"red": 0, "green": 0, "blue": 0},
-                        "textFormat": {"foregroundColor": {"red": 1, "green": 1, "blue": 1}}
-                    }
-                },
-                "fields": "userEnteredFormat(backgroundColor,textFormat.foregroundColor)"
-            }
-        })
-    svc.spreadsheets().batchUpdate(
-        spreadsheetId=SPREADSHEET_ID,
-        body={"requests": requests}
-    ).execute()
+# A..ZZ precomputed; sheet columns used here are far below 702
+_COL_LETTERS = tuple(_col_letters(i) for i in range(702))
+_num_to_col = _COL_LETTERS.__getitem__
 
 
-def find_competitor_data(df, keyword_phrase, country, row_number,seller_type, browser, MAX_RETRIES=8):
-    global AFFECTED_COLS, COL_YOUR_PRICE, COL_FBA_FEES, COL_STORAGE_FEES
-    competitor_data = find_top_recent_product(df, keyword_phrase)
+@dataclass
+class _QueuedRow:
+    """One row write waiting in a _BatchedSheetsWriter; done resolves once it has been sent."""
+    country: str
+    row: list
+    column_indices: List[int]
+    row_number: int
+    corresp_nums: Optional[list]
+    done: Future
+
+    @property
+    def label(self) -> str:
+        return f"row {self.row_number} in '{self.country}' sheet with columns {self.column_indices}"
+
+
+class _BatchedSheetsWriter:
+    """
+    Row writes from concurrent runs, sent as one spreadsheets.batchUpdate per spreadsheet every
+    flush_every rows or flush_interval_s seconds, whichever comes first. enqueue() returns a Future
+    per row holding the write's outcome; close() drains the rest.
+    """
+
+    def __init__(self, flush_every: int = 10, flush_interval_s: float = 5.0):
+        self.flush_every, self.flush_interval_s = flush_every, flush_interval_s
+        self._lock = threading.Lock()        # guards _pending / _count
+        self._send_lock = threading.Lock()   # one flush at a time, so batches land in enqueue order
+        self._pending: Dict[str, List[_QueuedRow]] = {}   # spreadsheet_id -> rows
+        self._count = 0
+        self._closed = threading.Event()
+        self._ticker = threading.Thread(target=self._tick, name="sheets-flush", daemon=True)
+        self._ticker.start()
+
+    def enqueue(self, row, column_indices, country, row_number, corresp_nums, ctx: SheetCtx) -> Future:
+        # requests are built at send time, from the tab metadata of that moment
+        queued = _QueuedRow(country, list(row), list(column_indices), row_number, corresp_nums, Future())
+        with self._lock:
+            self._pending.setdefault(ctx.spreadsheet_id, []).append(queued)
+            self._count += 1
+            due = self._count >= self.flush_every
+        if due:
+            self.flush()
+        return queued.done
+
+    def flush(self):
+        with self._send_lock:
+            with self._lock:
+                pending, self._pending, self._count = self._pending, {}, 0
+            for spreadsheet_id, rows in pending.items():
+                try:
+                    self._send(spreadsheet_id, rows)
+                except Exception as e:
+                    # never leave a caller waiting on a row that wasn't resolved
+                    for queued in rows:
+                        if not queued.done.done():
+                            queued.done.set_exception(e)
+
+    def close(self):
+        self._closed.set()
+        self._ticker.join()
+        self.flush()
+
+    def _tick(self):
+        while not self._closed.wait(self.flush_interval_s):
+            self.flush()
+
+    def _send(self, spreadsheet_id: str, rows: List[_QueuedRow]):
+        svc = _sheets_service(spreadsheet_id)
+        batch, sent = [], []
+        grown: Dict[str, int] = {}   # tab -> rowCount once the appendDimensions so far have run
+        for queued in rows:
+            try:
+                sheet_id, col_count, row_count = _get_sheet_id_and_cols(svc, spreadsheet_id, queued.country)
+                if queued.country in grown:
+                    row_count = grown[queued.country]   # an earlier row of this batch already grows the tab
+                requests, grown_to = _row_requests((sheet_id, col_count, row_count), queued.row,
+                                                   queued.column_indices, queued.row_number, queued.corresp_nums)
+            except Exception as e:
+                print(f"[SHEETS] Could not write {queued.label}: {e}")
+                queued.done.set_exception(e)
+                continue
+            if grown_to is not None:
+                grown[queued.country] = grown_to
+            batch.extend(requests)
+            sent.append(queued)
+        if not sent:
+            return
+        try:
+            _execute(svc.spreadsheets().batchUpdate(spreadsheetId=spreadsheet_id, body={"requests": batch}))
+        except Exception as e:
+            if len(sent) == 1:
+                print(f"[SHEETS] Could not write {sent[0].label}: {e}")
+                sent[0].done.set_exception(e)
+                return
+            print(f"[SHEETS] Batch of {len(sent)} row(s) failed: {e}")
+            # batchUpdate is all-or-nothing, so one bad row shouldn't take the others down with it.
+            # Nothing of the batch was applied: replay each row on its own against freshly fetched
+            # rowCounts, so its appendDimension covers only what the rows before it actually grew.
+            _sheet_tabs(svc, spreadsheet_id, refresh=True)
+            for queued in sent:
+                self._send(spreadsheet_id, [queued])
+            return
+        for country, row_count in grown.items():
+            _bump_row_count(spreadsheet_id, country, row_count)
+        for queued in sent:
+            print(f"[SHEETS] Updated {queued.label}")
+            queued.done.set_result(None)
+
+
+class _RowWriteBuffer:
+    """Cell edits for one sheet row, sent as a single fill_in_row_with_new_values_for_country batch."""
+
+    def __init__(self, ctx: SheetCtx, country: str, row_number: int, seller_type: str,
+                 writer: Optional[_BatchedSheetsWriter] = None):
+        self.ctx, self.country, self.row_number, self.seller_type = ctx, country, row_number, seller_type
+        self.writer = writer   # queue into a shared batch instead of writing right away
+        self.row = [""] * ROW_WIDTH
+        self.values: Dict[int, Any] = {}   # col -> value written ("" = format only)
+
+    def set(self, col: int, text, value=None):
+        """Stage text for col; value (e.g. the bare number) is written instead of text when given."""
+        self.row[col] = text
+        self.values[col] = text if value is None else value
+
+    def flush(self) -> Optional[Future]:
+        """Write the staged cells; with a writer, the queued write's Future (None when written here)."""
+        if not self.values:
+            return None
+        cols = list(self.values)
+        nums = [self.values[c] for c in cols]
+        self.values.clear()
+        if self.writer is not None:
+            return self.writer.enqueue(self.row, cols, self.country, self.row_number, nums, self.ctx)
+        fill_in_row_with_new_values_for_country(self.row, cols, self.country, self.row_number,
+                                                self.seller_type, nums, self.ctx)
+        return None
+
+
+def _metric_number(pm, key):
+    """A metric's parsed value (profitcal's Decimal) as a float for the sheet; "number" if it has none, "" if blank."""
+    metric = pm.get(key, {}) or {}
+    value = metric.get("value")
+    if value is not None:
+        return float(value)
+    return metric.get("number") or ""
+
+
+def find_competitor_data(df, keyword_phrase, country, row_number,seller_type, browser, ctx: Optional[SheetCtx] = None, MAX_RETRIES=8,
+                         writer: Optional[_BatchedSheetsWriter] = None) -> Optional[Future]:
+    """
+    Pick the competitor row, scrape its calculator metrics and write them to the sheet row. With a
+    writer the row is queued instead, and the returned Future holds the outcome of that write.
+    """
+    from profitcal import CALCULATOR_LOCK, get_profitability_metrics
+
+    if ctx is None:
+        ctx = sheet_ctx_for(seller_type, country)
+    if isinstance(df, str):
+        competitor_data = find_top_recent_product_stream(df, keyword_phrase)
+    else:
+        competitor_data = find_top_recent_product(df, keyword_phrase)
     print(f"competitor_data: {competitor_data}")
-    #write to sheet
-    row = [""] * ROW_WIDTH
+    #write to sheet (buffered: competitor + prof metrics cells go out in one batch at the end)
+    buf = _RowWriteBuffer(ctx, country, row_number, seller_type, writer)
     comp_title = competitor_data["product_details"] or ""
     comp_url   = competitor_data["url"]          or ""
     comp_mrev  = competitor_data["parent_level_revenue"] or ""
-    if seller_type != 'new_seller':
-        row[COL_YOUR_COMPETITOR]     = _hyper(comp_url, comp_title) if (comp_url or comp_title) else ""
-        row[COL_COMP_MREV]           = comp_mrev
-        fill_in_row_with_new_values_for_country(row, [COL_YOUR_COMPETITOR, COL_COMP_MREV], country, row_number,seller_type,None)
-    else:
-        row[COL_PRODUCTS+1]     = _hyper(comp_url, comp_title) if (comp_url or comp_title) else ""
-        row[COL_PRODUCTS+2]           = comp_mrev
-        fill_in_row_with_new_values_for_country(row, [COL_PRODUCTS+1, COL_PRODUCTS+2], country, row_number,seller_type,None)
+    buf.set(ctx.competitor_col, _hyper(comp_url, comp_title) if (comp_url or comp_title) else "")
+    buf.set(ctx.comp_mrev_col, comp_mrev)
     
     
     
@@ -389,13 +583,15 @@ def find_competitor_data(df, keyword_phrase, country, row_number,seller_type, br
         for attempt in range(1, MAX_RETRIES + 1):
             try:
                 print("[Info] Getting Profitability Calculator metrics.")
-                pm = get_profitability_metrics(
-                    browser,
-                    product_url=comp_url,
-                    wait_secs=60,
-                    close_all_tabs_first=False,
-                    close_others_after_open=True,
-                )
+                # one run at a time in the calculator: it closes every other tab when it opens
+                with CALCULATOR_LOCK:
+                    pm = get_profitability_metrics(
+                        browser,
+                        product_url=comp_url,
+                        wait_secs=60,
+                        close_all_tabs_first=False,
+                        close_others_after_open=True,
+                    )
                 # pm ={
                 #     "product_price": {
                 #         "text": "$3.42",
@@ -419,71 +615,56 @@ def find_competitor_data(df, keyword_phrase, country, row_number,seller_type, br
                 print(pm)
                 #write prof metrics to sheet
                 price_text   = (pm.get("product_price", {}) or {}).get("text") or ""
-                price_num    = (pm.get("product_price", {}) or {}).get("number") or ""
+                price_num    = _metric_number(pm, "product_price")
                 fba_text     = (pm.get("fba_fees", {}) or {}).get("text") or ""
-                fba_num      = (pm.get("fba_fees", {}) or {}).get("number") or ""
+                fba_num      = _metric_number(pm, "fba_fees")
                 today = datetime.now()
                 is_oct__nov_dec = today.month>=10
                 if is_oct__nov_dec:
                     storage_fee_text = pm.get("storage_fee_oct_dec", {}).get("text") or ""
-                    storage_fee_num = pm.get("storage_fee_oct_dec", {}).get("number") or ""
+                    storage_fee_num = _metric_number(pm, "storage_fee_oct_dec")
                 else:
                     storage_fee_text = pm.get("storage_fee_jan_sep", {}).get("text") or ""
-                    storage_fee_num = pm.get("storage_fee_jan_sep", {}).get("number") or ""
+                    storage_fee_num = _metric_number(pm, "storage_fee_jan_sep")
                 
-                #create 
-                corresp_nums = [ price_num, fba_num, storage_fee_num]
-                AFFECTED_COLS = [COL_YOUR_PRICE,COL_FBA_FEES,COL_STORAGE_FEES]
-    
-                if seller_type == 'existing_seller':
-                    if country not in ["US", "CAN", "AUS"]:
-                        for i,col in enumerate(AFFECTED_COLS):
-                            AFFECTED_COLS[i]+=1
-                        AFFECTED_COLS[0]-=1
-                    else:
-                        pass
-                        # for i,col in enumerate(AFFECTED_COLS):
-                        #     AFFECTED_COLS[i]-=2
-                elif seller_type == 'vendor':
-                    if country in ['US', 'CAN']:
-                        AFFECTED_COLS[2]+=2
-                        AFFECTED_COLS[1]+=2
-                    else:
-                        AFFECTED_COLS[2]+=3
-                else:     #new_seller
-                    # pass
-                    if country not in ["US", "CAN", "AUS"]:
-                        for i,col in enumerate(AFFECTED_COLS):
-                            AFFECTED_COLS[i]-=1
-                        AFFECTED_COLS[0]-=1
-                    else:
-                        for i,col in enumerate(AFFECTED_COLS):
-                            AFFECTED_COLS[i]-=2
-                
-                COL_YOUR_PRICE, COL_FBA_FEES, COL_STORAGE_FEES = AFFECTED_COLS[0], AFFECTED_COLS[1], AFFECTED_COLS[2]
-
-                row[COL_YOUR_PRICE] = price_text
-                row[COL_FBA_FEES] = fba_text
-                row[COL_STORAGE_FEES] = storage_fee_text
-                # print(row)
-                fill_in_row_with_new_values_for_country(row, [COL_YOUR_PRICE,COL_FBA_FEES,COL_STORAGE_FEES],country,row_number,seller_type,corresp_nums)
-                COL_YOUR_PRICE, COL_FBA_FEES, COL_STORAGE_FEES = ORIGINAL_COL_YOUR_PRICE, ORIGINAL_COL_FBA_FEES, ORIGINAL_COL_STORAGE_FEES
-                return
+                # the sheet gets the bare numbers; vendor sheets keep their own FBA value, so that
+                # column is only formatted
+                buf.set(ctx.your_price_col, price_text, price_num)
+                buf.set(ctx.fba_fees_col, fba_text, "" if seller_type == 'vendor' else fba_num)
+                buf.set(ctx.storage_fees_col, storage_fee_text, storage_fee_num)
+                break
             
             except Exception as e:
                 msg = f"profitability_metrics attempt {attempt} failed: {e}"
                 print("[ERROR]", msg)
                 if attempt == MAX_RETRIES:
                     print("[ERROR] Profitability: max retries reached.")
-    
-    
+                else:
+                    delay = min(CALCULATOR_BACKOFF_MAX_S, CALCULATOR_BACKOFF_INITIAL_S * 2 ** attempt)
+                    time.sleep(delay * (0.5 + random.random() * 0.5))
+    # also reached when the calculator gave up, so the competitor cells still land
+    return buf.flush()
+
 
-def process_manual_csv(row_number: int, country: str, df: pd.DataFrame, keyword_phrase: str, seller_type: str, browser) -> Dict[str, Any]:
+def _retriable(e: Exception) -> bool:
+    """False for Sheets client errors (4xx other than 429) that another attempt can't fix."""
+    from googleapiclient.errors import HttpError
+
+    if isinstance(e, HttpError):
+        status = getattr(e.resp, "status", None)
+        return not (status and 400 <= int(status) < 500 and int(status) != 429)
+    return True
+
+def process_manual_csv(row_number: int, country: str, df: Union[pd.DataFrame, str], keyword_phrase: str, seller_type: str, browser,
+                       writer: Optional[_BatchedSheetsWriter] = None) -> Dict[str, Any]:
     """
     Process manual CSV upload:
     1. Print df.head()
     2. Check if the specified row in the Google Sheet has empty competitor columns
     3. Return result with status and any error messages
+
+    df is the uploaded CSV as a DataFrame, or its path (read by the streaming picker).
+    With a writer the row's cells are queued into its shared batch rather than written here.
     """
     try:
         
@@ -509,38 +690,30 @@ def process_manual_csv(row_number: int, country: str, df: pd.DataFrame, keyword_
             }
         
         # Initialize Google Sheets service
-        global SPREADSHEET_ID
-        if seller_type == 'new_seller':
-            SPREADSHEET_ID = NEW_SELLER_SPREADSHEET_ID
-        elif seller_type == 'existing_seller':
-            SPREADSHEET_ID = EXISTING_SELLER_SPREADSHEET_ID
-        else:
-            SPREADSHEET_ID = VENDOR_SPREADSHEET_ID
-        print("Updated Spread sheet id to ",SPREADSHEET_ID)
-        svc = _sheets_service()
+        ctx = sheet_ctx_for(seller_type, country)
+        print("Using spreadsheet ",ctx.spreadsheet_id)
+        svc = _sheets_service(ctx.spreadsheet_id)
         
-        # Try to read the specified row, but don't fail if it doesn't exist
+        # Competitor / competitor-MREV columns for this layout (adjacent)
+        comp_idx, mrev_idx = ctx.competitor_col, ctx.comp_mrev_col
+        
+        # Read just those two cells of the specified row, but don't fail if the row doesn't exist
         try:
-            row_data = _read_row(svc, country, row_number)
+            cells = _read_row(svc, ctx.spreadsheet_id, country, row_number, [comp_idx, mrev_idx])
             row_exists = True
         except Exception:
             # Row doesn't exist yet, that's fine - we'll create it
-            row_data = [""] * 32  # Empty row with 32 columns
+            cells = {comp_idx: "", mrev_idx: ""}
             row_exists = False
             print(f"Row {row_number} doesn't exist yet - will create it")
         
         # Check if competitor columns are empty (or if row is new)
-        if seller_type != 'new_seller':
-            competitor_col = row_data[COL_YOUR_COMPETITOR] if len(row_data) > COL_YOUR_COMPETITOR else ""
-            comp_mrev_col = row_data[COL_COMP_MREV] if len(row_data) > COL_COMP_MREV else ""
-        else:
-            competitor_col = row_data[COL_PRODUCTS+1] if len(row_data) > COL_PRODUCTS+1 else ""
-            comp_mrev_col = row_data[COL_PRODUCTS+2] if len(row_data) > COL_PRODUCTS+2 else ""
+        competitor_col, comp_mrev_col = cells[comp_idx], cells[mrev_idx]
         
         print(f"Row {row_number} data:")
         print(f"  Row exists: {row_exists}")
-        print(f"  Competitor column ({COL_YOUR_COMPETITOR}): '{competitor_col}'")
-        print(f"  Competitor MREV column ({COL_COMP_MREV}): '{comp_mrev_col}'")
+        print(f"  Competitor column ({comp_idx}): '{competitor_col}'")
+        print(f"  Competitor MREV column ({mrev_idx}): '{comp_mrev_col}'")
         
         # Check if both competitor columns are empty
         competitor_empty = not competitor_col or competitor_col.strip() == ""
@@ -550,26 +723,25 @@ def process_manual_csv(row_number: int, country: str, df: pd.DataFrame, keyword_
         
         if competitor_empty and comp_mrev_empty:
             print("✓ Competitor columns are empty - ready for data insertion")
-            # i want to do the following part in a separate thread, i.e. it should send return message and continue this part as well
+            # Runs synchronously on its process_multiple_manually worker: the Playwright browser is bound
+            # to this thread, and the runs already overlap each other through that pool
             
-            MAX_RETRIES = 8
-            for attempt in range(1, MAX_RETRIES + 1):
+            for attempt in range(1, COMPETITOR_MAX_RETRIES + 1):
                 try:
-                    find_competitor_data(df, keyword_phrase, country, row_number,seller_type,browser, MAX_RETRIES=8)
+                    queued = find_competitor_data(df, keyword_phrase, country, row_number,seller_type,browser, ctx, MAX_RETRIES=8, writer=writer)
+                    if queued is not None:
+                        # wait for the batched write, so its errors are retried / reported like a direct write's
+                        queued.result()
                     break
                 except Exception as e:
                     print(f"Error scraping competitor data: {e}")
-                    time.sleep(20)
-                    if attempt == MAX_RETRIES:
-                        print("[ERROR] Profitability: max retries reached.")
+                    if attempt == COMPETITOR_MAX_RETRIES or not _retriable(e):
+                        print("[ERROR] Profitability: giving up after attempt", attempt)
                         return {
                             "success": False,
-                            "error": error_msg,     
+                            "error": f"Error scraping competitor data: {e}",
                         }
-            
-            # data_thread = threading.Thread(target=find_competitor_data, args=(df, keyword_phrase, country, row_number))
-            # data_thread.daemon = True
-            # data_thread.start()
+                    time.sleep(min(COMPETITOR_BACKOFF_MAX_S, 2 ** (attempt - 1)) + random.random())
             
             return {
                 "success": True,
@@ -599,17 +771,75 @@ def process_manual_csv(row_number: int, country: str, df: pd.DataFrame, keyword_
             "error": error_msg
         }
 
+def _prefetch_sheet_meta(runs_data):
+    """Fetch tab metadata once per target spreadsheet so no run pays for spreadsheets.get."""
+    for seller_type in {run["seller_type"] for run in runs_data}:
+        spreadsheet_id = _spreadsheet_id_for(seller_type)
+        try:
+            _sheet_tabs(_sheets_service(spreadsheet_id), spreadsheet_id)
+        except Exception as e:
+            # not fatal: the per-row lookup fetches (and reports) on its own
+            print(f"[warn] Could not prefetch sheet metadata for {seller_type}: {e}")
+
+# process_multiple_manually's workers, kept for the life of the process: each thread starts its own
+# Playwright driver (helium_boot.get_playwright, a Node subprocess) that nothing stops, so a pool per
+# call would leave MAX_MANUAL_WORKERS drivers behind after every batch
+_MANUAL_POOL = ThreadPoolExecutor(max_workers=MAX_MANUAL_WORKERS, thread_name_prefix="manual")
+# Each pool thread's CDP connection, kept between runs like its driver, so profitcal finds the
+# calculator tab it left on it last time instead of opening a new one per run
+_RUN_LOCAL = threading.local()
+
+def _worker_browser(cdp_url: str):
+    """This pool thread's connection to the Chrome at cdp_url, (re)connecting when it dropped or moved."""
+    browser = getattr(_RUN_LOCAL, "browser", None)
+    if browser is not None and _RUN_LOCAL.cdp_url == cdp_url:
+        try:
+            if browser.is_connected():
+                return browser
+        except Exception:
+            pass
+    if browser is not None:
+        try:
+            browser.close()  # disconnect only; Chrome keeps running
+        except Exception:
+            pass
+    browser = get_playwright().chromium.connect_over_cdp(cdp_url)
+    _RUN_LOCAL.browser, _RUN_LOCAL.cdp_url = browser, cdp_url
+    return browser
+
+def _run_manual(run, cdp_url: str, writer: Optional[_BatchedSheetsWriter] = None) -> Dict[str, Any]:
+    """
+    One run on a pool thread. Playwright sync objects must stay on the thread that made them, so
+    each run goes through its thread's driver (helium_boot.get_playwright) and connection.
+    """
+    browser = _worker_browser(cdp_url)
+    # the CSV path goes through as-is: the picker streams it instead of building a DataFrame
+    return process_manual_csv(run["row"], run["country"], run["csvpath"], run["keyword"], run["seller_type"], browser, writer)
+
 def process_multiple_manually(runs_data):
-    browser, ctx , pw = open_browser(CHROME_PATH, USER_DATA_DIR, PROFILE_DIR, CDP_PORT, EXT_ID)
-    for run in runs_data:
-        df = pd.read_csv(run["csvpath"])
-        result = process_manual_csv(run["row"], run["country"], df, run["keyword"], run["seller_type"], browser)
-        if result["success"]:
-            print(f"✅ Run passed - further processing successful")
-        else:
-            print(f"❌ Run failed - further processing failed")
-            print(f"Error: {result.get('error', 'Unknown error')}")
-    close_browser(browser, ctx, pw)
+    _prefetch_sheet_meta(runs_data)
+    cdp_port, _ = _ensure_chrome_running(CHROME_PATH, USER_DATA_DIR, PROFILE_DIR, CDP_PORT)
+    # Launch/attach once here so the Helium extension is awake before the workers connect
+    browser, ctx , pw = open_browser(CHROME_PATH, USER_DATA_DIR, PROFILE_DIR, cdp_port, EXT_ID)
+    cdp_url = f"http://127.0.0.1:{cdp_port}"
+    # rows from all runs share batchUpdates instead of one request each. Every run waits for its own
+    # row, so at most one row per worker is ever queued: flush as soon as they are all in
+    writer = _BatchedSheetsWriter(flush_every=MAX_MANUAL_WORKERS, flush_interval_s=1)
+    try:
+        futures = [_MANUAL_POOL.submit(_run_manual, run, cdp_url, writer) for run in runs_data]
+        for fut in futures:
+            try:
+                result = fut.result()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            if result["success"]:
+                print(f"✅ Run passed - further processing successful")
+            else:
+                print(f"❌ Run failed - further processing failed")
+                print(f"Error: {result.get('error', 'Unknown error')}")
+    finally:
+        writer.close()   # drain queued rows before tearing the browser down
+        close_browser(browser, ctx, pw)
 
 # === CLI Testing ===
 if __name__ == "__main__":
@@ -618,15 +848,22 @@ if __name__ == "__main__":
       1) Ensure env vars are set: SPREADSHEET_ID, GOOGLE_CLIENT_EMAIL, GOOGLE_PRIVATE_KEY
       2) Ensure tabs exist: US, UK, CAN, AUS, DE, UAE
       3) python manual.py
+    Pass --shutdown-chrome to quit the Chrome that runs leave running, instead of testing.
     """
+    import sys
     import pandas as pd
     import time
+
+    if "--shutdown-chrome" in sys.argv[1:]:
+        if not shutdown_chrome(CDP_PORT):
+            print(f"[info] No Chrome listening on {CDP_PORT}")
+        sys.exit(0)
     
     # Create a sample DataFrame for testing
     
     
     csv_path = "C:/Users/hurai/Downloads/amz.csv"
-    df = pd.read_csv(csv_path)
+    df = load_csv(csv_path)
     seller_type = "new_seller"
     # Test parameters
     test_row_number = 4  # Make sure this row exists in your sheet
@@ -677,22 +914,11 @@ if __name__ == "__main__":
 #     seller_type = "new_seller"
 #     row = [""] * ROW_WIDTH
 
-#     AFFECTED_COLS = [COL_YOUR_PRICE,COL_FBA_FEES,COL_STORAGE_FEES]
-    
-#     if country not in ["US", "CAN", "AUS"]:
-#         for i,col in enumerate(AFFECTED_COLS):
-#             AFFECTED_COLS[i]-=1
-#         AFFECTED_COLS[0]-=1
-#     else:
-#         for i,col in enumerate(AFFECTED_COLS):
-#             AFFECTED_COLS[i]-=2
-    
-#     COL_YOUR_PRICE, COL_FBA_FEES, COL_STORAGE_FEES = AFFECTED_COLS[0], AFFECTED_COLS[1], AFFECTED_COLS[2]
+#     ctx = sheet_ctx_for(seller_type, country)
 
-#     row[COL_YOUR_PRICE] = price_text
-#     row[COL_FBA_FEES] = fba_text
-#     row[COL_STORAGE_FEES] = storage_fee_text
-#     fill_in_row_with_new_values_for_country(row, [COL_YOUR_PRICE,COL_FBA_FEES,COL_STORAGE_FEES],country,row_number,seller_type,corresp_nums)
-#     COL_YOUR_PRICE, COL_FBA_FEES, COL_STORAGE_FEES = ORIGINAL_COL_YOUR_PRICE, ORIGINAL_COL_FBA_FEES, ORIGINAL_COL_STORAGE_FEES
+#     row[ctx.your_price_col] = price_text
+#     row[ctx.fba_fees_col] = fba_text
+#     row[ctx.storage_fees_col] = storage_fee_text
+#     fill_in_row_with_new_values_for_country(row, [ctx.your_price_col, ctx.fba_fees_col, ctx.storage_fees_col],country,row_number,seller_type,corresp_nums, ctx)
 
 
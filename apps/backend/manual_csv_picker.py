@@ -2,6 +2,7 @@
 from __future__ import annotations
 import csv
 import os
+import re
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 import pandas as pd
@@ -13,6 +14,11 @@ COL_URL             = "URL"
 COL_PARENT_REVENUE  = "Parent Level Revenue"
 COL_REVENUE = "Revenue"
 COL_CREATION_DATE   = "Creation Date"
+COL_REVIEW_COUNT    = "Review Count"
+
+# Every column the pickers read; load_csv parses only these
+CSV_COLUMNS = frozenset({COL_PRODUCT_DETAILS, COL_URL, COL_PARENT_REVENUE, COL_REVENUE,
+                         COL_CREATION_DATE, COL_REVIEW_COUNT})
 
 # Try a few common date formats you may see in exports
 _DATE_FORMATS = (
@@ -22,6 +28,12 @@ _DATE_FORMATS = (
     "%d-%b-%Y",        # 01-Aug-2025
     "%b %d, %Y",       # Aug 01, 2025
 )
+# Formats an earlier _DATE_FORMATS entry also parses for some values (01/08/2025 reads as
+# %m/%d/%Y first). Putting one of these first would change how those ambiguous values parse.
+_SHADOWED_FORMATS = frozenset({"%d/%m/%Y"})
+
+# $ and thousands separators, dropped in one str.translate pass
+_STRIP_CURRENCY = str.maketrans("", "", "$,")
 
 def _to_number(s: str) -> Optional[float]:
     """Convert currency/number like '$12,345.67' -> 12345.67; returns None if blank/invalid."""
@@ -36,7 +48,7 @@ def _to_number(s: str) -> Optional[float]:
         neg = True
         s = s[1:-1]
     # Remove $ and commas and spaces
-    s = s.replace("$", "").replace(",", "").strip()
+    s = s.translate(_STRIP_CURRENCY).strip()
     if not s:
         return None
     try:
@@ -45,13 +57,31 @@ def _to_number(s: str) -> Optional[float]:
     except ValueError:
         return None
 
-def _parse_date(s: str) -> Optional[datetime]:
-    """Parse date using several common formats; returns None if it can't parse."""
+def _detect_date_format(sample) -> Optional[str]:
+    """The first of _DATE_FORMATS that parses sample, or None. Exports use one format per file, so
+    callers detect it once and hand it to _parse_date instead of failing through the list per value.
+    None too for a _SHADOWED_FORMATS match: those files keep the plain list order."""
+    s = str(sample or "").strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            datetime.strptime(s, fmt)
+            return None if fmt in _SHADOWED_FORMATS else fmt
+        except ValueError:
+            continue
+    return None
+
+def _parse_date(s: str, fmt: Optional[str] = None) -> Optional[datetime]:
+    """Parse date using several common formats (fmt, the file's detected one, first); returns None if it can't parse."""
     if s is None:
         return None
     s = s.strip()
     if not s:
         return None
+    if fmt:
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            pass
     for fmt in _DATE_FORMATS:
         try:
             return datetime.strptime(s, fmt)
@@ -70,9 +100,54 @@ def _parse_date(s: str) -> Optional[datetime]:
     return None
 
 
-def filter_next_best_product(df, keyword_phrase,flag):
+def _revenue_series(df) -> pd.Series:
+    """_to_number over the revenue column (Parent Level Revenue, else Revenue), vectorized; NaN if invalid."""
+    col = COL_PARENT_REVENUE if COL_PARENT_REVENUE in df.columns else COL_REVENUE
+    s = df[col].astype(str).str.strip()
+    neg = s.str.startswith("(") & s.str.endswith(")")
+    s = s.where(~neg, s.str[1:-1])
+    s = s.str.translate(_STRIP_CURRENCY).str.strip()
+    num = pd.to_numeric(s, errors="coerce")
+    return num.where(~neg, -num)
+
+def _date_series(col: pd.Series) -> pd.Series:
+    """
+    _parse_date over a column: the format detected from the first value, then the rest of
+    _DATE_FORMATS in order, each as one C-level pass; leftovers get the per-value fallback.
+    """
+    s = col.astype(str).str.strip()
+    out = pd.Series(pd.NaT, index=s.index, dtype="datetime64[ns]")
+    present = col.dropna().astype(str).str.strip()
+    present = present[present != ""]
+    detected = _detect_date_format(present.iloc[0]) if len(present) else None
+    formats = ((detected,) if detected else ()) + tuple(f for f in _DATE_FORMATS if f != detected)
+    for fmt in formats:
+        todo = out.isna()
+        if not todo.any():
+            break
+        out[todo] = pd.to_datetime(s[todo], format=fmt, errors="coerce")
+    todo = out.isna() & (s != "")
+    if todo.any():
+        out[todo] = pd.to_datetime(s[todo].map(_parse_date), errors="coerce")
+    return out
+
+
+def _keyword_pattern(keyword_phrase: str) -> re.Pattern:
+    """Case-insensitive literal match for keyword_phrase (shared by the DataFrame and streaming pickers)."""
+    return re.compile(re.escape(keyword_phrase), re.IGNORECASE)
+
+def _keyword_rows(df, keyword_phrase):
+    """Rows whose Product Details contain keyword_phrase, with Review Count already numeric (NaN if not).
+    Computed once per lookup and handed to both filters, so the text column is scanned a single time."""
+    mask = df[COL_PRODUCT_DETAILS].str.contains(_keyword_pattern(keyword_phrase), na=False)
+    kw = df.loc[mask].copy()
+    kw[COL_REVIEW_COUNT] = pd.to_numeric(kw[COL_REVIEW_COUNT], errors='coerce')
+    return kw
+
+
+def filter_next_best_product(df, keyword_phrase,flag, kw=None):
     #return the df with only one element which is latest product and includes the keyword_phrase
-    df_filtered = df[df['Product Details'].str.contains(keyword_phrase, case=False)]
+    df_filtered = kw if kw is not None else _keyword_rows(df, keyword_phrase)
     if len(df_filtered) == 0:
         return df.iloc[0]
     if len(df_filtered) == 1:
@@ -80,45 +155,44 @@ def filter_next_best_product(df, keyword_phrase,flag):
     if flag == 1:   #return value with most recent creation date
         df_filtered = df_filtered.sort_values(by='Creation Date', ascending=False)
     else:           #return value with least review count
-        df_filtered['Review Count'] = pd.to_numeric(df_filtered['Review Count'], errors='coerce')
-        df_filtered.dropna(subset=['Review Count'], inplace=True)
-        df_filtered = df_filtered.sort_values(by='Review Count', ascending=True)
+        reviewed = df_filtered.dropna(subset=['Review Count'])
+        if len(reviewed) == 0:   # no numeric Review Count at all: the first keyword row
+            return df_filtered.iloc[0]
+        df_filtered = reviewed.sort_values(by='Review Count', ascending=True)
     return df_filtered.iloc[0]
 
-def filter_csv_by_reviews_and_keyword(df, keyword_phrase, max_reviews=1000):
+def filter_csv_by_reviews_and_keyword(df, keyword_phrase, max_reviews=1000, kw=None):
     """
     Filters input CSV rows where:
       - Review Count <= max_reviews i.e. 1000
       - Display Order column includes the keyword_phrase (case-insensitive)
 
-    Saves filtered rows to output_csv.
+    kw: the keyword rows from _keyword_rows, when the caller already has them.
     """
-    filtered_rows = []
-    # print(keyword_phrase.lower())
-
-    df_filtered = df[df['Product Details'].str.contains(keyword_phrase, case=False)]
-    df_filtered['Review Count'] = pd.to_numeric(df_filtered['Review Count'], errors='coerce')
-    df_filtered.dropna(subset=['Review Count'], inplace=True)  # Drop any rows where the conversion failed (i.e., where 'Review Count' is NaN)
-    df_filtered = df_filtered[df_filtered['Review Count'] <= max_reviews]
+    if kw is None:
+        kw = _keyword_rows(df, keyword_phrase)
+    # NaN review counts (failed conversions) compare False, so they drop out here too
+    df_filtered = kw[kw['Review Count'] <= max_reviews]
     # print length of df
     print(f"Filtered rows: {len(df_filtered)}")
     if len(df_filtered) == 0:
-        return filter_next_best_product(df, keyword_phrase,2)
+        return filter_next_best_product(df, keyword_phrase,2, kw)
 
     return df_filtered
 
-def extract_result_from_df(df_filtered):
-    df_dict = df_filtered.to_dict()
-    print(f"df is only one element, cant sort or filter further:")
-    try:
-        best_rev =  df_dict[COL_PARENT_REVENUE]
-    except:
-        best_rev = df_dict[COL_REVENUE]
+def extract_result_from_df(row: pd.Series) -> Dict[str, str]:
+    """Result payload for one picked row, read straight off the Series."""
+    # Revenue only when the export has no Parent Level Revenue column at all
+    best_rev = row.get(COL_PARENT_REVENUE, row.get(COL_REVENUE))
     result = {
-        "product_details": (df_dict[COL_PRODUCT_DETAILS] or "").strip(),
-        "url": (df_dict[COL_URL] or "").strip(),
+        "product_details": (row.get(COL_PRODUCT_DETAILS) or "").strip(),
+        "url": (row.get(COL_URL) or "").strip(),
         "parent_level_revenue": str(best_rev or "").strip(),
-        "creation_date": str(df_dict[COL_CREATION_DATE] or "").strip(),
+        "creation_date": str(row.get(COL_CREATION_DATE) or "").strip(),
+        # # Handy extras you might want downstream
+        # "asin": (row["ASIN"] or "").strip(),
+        # "brand": (row["Brand"] or "").strip(),
+        # "price": (row["Price  $"] or "").strip(),
     }
     # print(result)
     return result
@@ -132,66 +206,131 @@ def find_top_recent_product(df, keyword_phrase: str, within_years: int = 2) -> O
 
     Returns None if no qualifying rows found.
     """
-    df_filtered = filter_csv_by_reviews_and_keyword(df, keyword_phrase)
+    kw = _keyword_rows(df, keyword_phrase)
+    df_filtered = filter_csv_by_reviews_and_keyword(df, keyword_phrase, kw=kw)
     # continue if df is DataFrame, if it is only one element, return it
     if isinstance(df_filtered, pd.Series): 
+        print(f"df is only one element, cant sort or filter further:")
         result = extract_result_from_df(df_filtered)
         return result
 
     cutoff = datetime.now() - timedelta(days=365 * within_years)
-    best_row = None
-    best_rev = float("-inf")
-
-    for idx,row in df_filtered.iterrows():
-        # Access columns defensively
-
-        created_at = _parse_date(row[COL_CREATION_DATE])
-        if not created_at or created_at < cutoff:
-            continue
 
-        try:
-            rev = _to_number(row[COL_PARENT_REVENUE])
-        except:
-            rev = _to_number(row[COL_REVENUE])
-
-        if rev is None:
-            continue
-
-        if rev > best_rev:
-            best_rev = rev
-            best_row = row
-        elif rev == best_rev and best_row:
-            # Tie-breaker 1: most recent Creation Date wins
-            prev_dt = _parse_date(best_row[COL_CREATION_DATE])
-            if prev_dt and created_at > prev_dt:
-                best_row = row
-            # (Optional) add more tie-breakers if you like (e.g., higher Review Count)
+    # Highest revenue among rows created since cutoff; ties go to the most recent Creation Date,
+    # then to the earlier row (stable sort)
+    rev = _revenue_series(df_filtered)
+    created = _date_series(df_filtered[COL_CREATION_DATE])
+    ok = ((created >= cutoff) & rev.notna()).to_numpy()
+    best_row = None
+    if ok.any():
+        keys = pd.DataFrame({"rev": rev.to_numpy()[ok], "dt": created.to_numpy()[ok]})
+        best_pos = keys.sort_values(["rev", "dt"], ascending=False, kind="stable").index[0]
+        best_row = df_filtered.iloc[ok.nonzero()[0][best_pos]]
 
     if best_row is None:
-        single_item =  filter_next_best_product(df, keyword_phrase,1)
+        single_item =  filter_next_best_product(df, keyword_phrase,1, kw)
         result = extract_result_from_df(single_item)
         return result
 
     # Build a concise result payload (add fields as you need)
+    return extract_result_from_df(best_row)
+
+def load_csv(path: str) -> pd.DataFrame:
+    """
+    Read an export for find_top_recent_product: only CSV_COLUMNS, all as text. The pickers parse
+    revenue / review count / dates themselves, so pandas type inference on the other columns
+    (most of a wide export) is skipped. A callable usecols tolerates either revenue header.
+    """
+    return pd.read_csv(path, usecols=lambda c: c in CSV_COLUMNS, dtype=str, engine="c")
+
+
+def _review_count(s) -> Optional[float]:
+    """Numeric Review Count like pd.to_numeric(errors='coerce'); None where that gives NaN."""
     try:
-        best_rev =  best_row[COL_PARENT_REVENUE]
-    except:
-        best_rev = best_row[COL_REVENUE]
-    result = {
-        "product_details": (best_row[COL_PRODUCT_DETAILS] or "").strip(),
-        "url": (best_row[COL_URL] or "").strip(),
-        "parent_level_revenue": str(best_rev or "").strip(),
-        "creation_date": str(best_row[COL_CREATION_DATE] or "").strip(),
-        # # Handy extras you might want downstream
-        # "asin": (best_row["ASIN"] or "").strip(),
-        # "brand": (best_row["Brand"] or "").strip(),
-        # "price": (best_row["Price  $"] or "").strip(),
+        val = float(str(s).strip())
+    except (TypeError, ValueError):
+        return None
+    return None if val != val else val
+
+
+def _row_result(row: Dict[str, str], rev_col: str) -> Dict[str, str]:
+    return {
+        "product_details": (row.get(COL_PRODUCT_DETAILS) or "").strip(),
+        "url": (row.get(COL_URL) or "").strip(),
+        "parent_level_revenue": str(row.get(rev_col) or "").strip(),
+        "creation_date": str(row.get(COL_CREATION_DATE) or "").strip(),
     }
-    # print(result)
-    return result
+
+
+def find_top_recent_product_stream(path: str, keyword_phrase: str, within_years: int = 2,
+                                   max_reviews: int = 1000) -> Optional[Dict[str, str]]:
+    """
+    find_top_recent_product for a CSV file, in one csv.DictReader pass without building a DataFrame.
+
+    Picks the same row: highest revenue among keyword rows with <= max_reviews reviews created
+    within `within_years`, falling back to the least-reviewed / most recently created keyword
+    row, then to the first row. Returns None for an empty CSV.
+    """
+    pattern = _keyword_pattern(keyword_phrase)
+    cutoff = datetime.now() - timedelta(days=365 * within_years)
+
+    first_row = None
+    kw_rows = 0
+    kw_first = None
+    least_reviewed, least_rc = None, None     # fallback when no keyword row has <= max_reviews
+    latest_created = None                     # fallback when none of those is recent
+    any_reviewed = False
+    best_row, best_rev, best_dt = None, float("-inf"), None
+    date_fmt, fmt_detected = None, False      # detected from the first candidate's date, as _date_series does
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        rev_col = COL_PARENT_REVENUE if COL_PARENT_REVENUE in (reader.fieldnames or ()) else COL_REVENUE
+        for row in reader:
+            if first_row is None:
+                first_row = row
+            if not pattern.search(row.get(COL_PRODUCT_DETAILS) or ""):
+                continue
+            kw_rows += 1
+            if kw_first is None:
+                kw_first = row
+            created_raw = row.get(COL_CREATION_DATE) or ""
+            if created_raw and (latest_created is None or created_raw > latest_created[COL_CREATION_DATE]):
+                latest_created = row
+
+            rc = _review_count(row.get(COL_REVIEW_COUNT))
+            if rc is None:
+                continue
+            if least_rc is None or rc < least_rc:
+                least_reviewed, least_rc = row, rc
+            if rc > max_reviews:
+                continue
+            any_reviewed = True
+
+            if not fmt_detected and created_raw.strip():
+                date_fmt, fmt_detected = _detect_date_format(created_raw), True
+            created_at = _parse_date(created_raw, date_fmt)
+            if not created_at or created_at < cutoff:
+                continue
+            rev = _to_number(row.get(rev_col))
+            if rev is None:
+                continue
+            if rev > best_rev or (rev == best_rev and best_dt and created_at > best_dt):
+                best_row, best_rev, best_dt = row, rev, created_at
+
+    if first_row is None:
+        return None
+    if best_row is None:
+        if kw_rows == 0:
+            best_row = first_row
+        elif kw_rows == 1:
+            best_row = kw_first
+        else:
+            best_row = (latest_created if any_reviewed else least_reviewed) or kw_first
+    return _row_result(best_row, rev_col)
 
 #write code to test from cli, i will hardcode csv_path, convert to df, send to find_top_recent_product, print result
 if __name__ == "__main__":
     csv_path = "C:/Users/hurai/Downloads/amz.csv"
-    df = pd.read_csv(csv_path)
+    df = load_csv(csv_path)
     result = find_top_recent_product(df, "face wash")
\ No newline at end of file
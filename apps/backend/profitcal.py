@@ -1,9 +1,36 @@
 # profitcal.py
+import os
 import re
-import time
-from typing import Dict, Optional
+import threading
+import weakref
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Optional
 from playwright.sync_api import Browser, Page
 
+# Compiled once; _clean_currency alone runs four times per product
+_CURRENCY_STRIP_RE = re.compile(r"[^0-9.]")
+_FBA_DIGIT_RE = re.compile(r"\d.*")
+_CALC_BTN_RE = re.compile(r"profitability|calculator", re.I)
+
+# Calculator values found from their label: the first element after it (document order) whose own
+# text has a digit. Survives restyles, unlike the styled-components hashes (sc-zbfRe.bUrasH ...).
+_HAS_DIGIT = "text()[translate(., '0123456789', '') != .]"
+_FBA_VALUE_XPATH = f"//*[contains(normalize-space(text()),'FBA Fees')]/following::*[{_HAS_DIGIT}][1]"
+_STORAGE_VALUE_XPATH = f"//*[contains(normalize-space(text()),'Storage Fee')]/following::*[{_HAS_DIGIT}][1]"
+# Last resort: index into the div.sc-zbfRe.bUrasH list, per marketplace (default 11)
+_FBA_CLASS_INDEX = {"au": 8, "ca": 8, "ae": 8}
+_AE_STORAGE_CLASS_INDEX = 10
+# PROFITCAL_CLOSE_OTHERS=0 turns off close_others_after_open everywhere (one pg.close() round trip per
+# other tab). It stays on by default: Chrome outlives runs now, so without it every run leaves a tab.
+CLOSE_OTHERS = os.getenv("PROFITCAL_CLOSE_OTHERS", "1") != "0"
+
+# Held by every caller around get_profitability_metrics: the calculator is one Helium panel in the
+# shared Chrome, and each call brings its tab to the front and (optionally) closes the others
+CALCULATOR_LOCK = threading.Lock()
+
+# Marketplaces whose calculator has the data-testid fields (storage fees, price input)
+_FAST_CODES = frozenset({"us", "uk", "de"})
+
 def _pick_ctx(browser: Browser):
     return browser.contexts[0] if browser.contexts else browser.new_context()
 
@@ -22,7 +49,7 @@ def _close_others(browser: Browser, keep: Page) -> int:
     closed = 0
     for ctx in list(browser.contexts):
         for pg in list(ctx.pages):
-            if pg is keep:
+            if pg is keep or pg.is_closed():
                 continue
             try:
                 pg.close()
@@ -31,21 +58,40 @@ def _close_others(browser: Browser, keep: Page) -> int:
                 pass
     return closed
 
+def _to_decimal(number: str) -> Optional[Decimal]:
+    """Decimal for a _clean_currency result; None if blank or not a number (e.g. '1.2.3')."""
+    try:
+        return Decimal(number) if number else None
+    except InvalidOperation:
+        return None
+
+def _metric(text: str) -> Dict[str, Any]:
+    """{"text", "number", "value"} for one calculator field; value is the parsed Decimal (or None)."""
+    number = _clean_currency(text)
+    return {"text": text, "number": number, "value": _to_decimal(number)}
+
+# Calculator tab per Browser connection, and the tabs that already have _HELPERS_JS installed. Weak,
+# so a dropped connection takes its entries with it
+_CALC_PAGES: "weakref.WeakKeyDictionary[Browser, Page]" = weakref.WeakKeyDictionary()
+_HELPER_PAGES: "weakref.WeakSet[Page]" = weakref.WeakSet()
+
+def _reusable_page(browser: Browser) -> Optional[Page]:
+    """The calculator tab a previous get_profitability_metrics call left on this browser, if still open."""
+    page = _CALC_PAGES.get(browser)
+    return page if page is not None and not page.is_closed() else None
+
 def _clean_currency(s: str) -> str:
-    return re.sub(r"[^0-9.]", "", (s or "").strip())
+    return _CURRENCY_STRIP_RE.sub("", (s or "").strip())
 
-def _wait_for_all(page: Page, selectors: Dict[str, str], timeout_ms: int = 30000):
-    for name, sel in selectors.items():
-        try:
-            page.wait_for_selector(sel, timeout=timeout_ms)
-        except Exception:
-            # Dump a small snippet for debug, but avoid massive page HTML
-            try:
-                snippet = page.inner_text("body", timeout=2000)
-                snippet = (snippet[:1200] + "…") if len(snippet) > 1200 else snippet
-            except Exception:
-                snippet = "<body text unavailable>"
-            raise RuntimeError(f"Missing selector for '{name}': {sel}\n\n[DEBUG SNIPPET]\n")
+def _missing_selector(page: Page, name: str, sel: str, err: Exception) -> RuntimeError:
+    """The 'Missing selector' error for a read site, with a small body-text snippet for debug."""
+    # avoid massive page HTML
+    try:
+        snippet = page.inner_text("body", timeout=2000)
+        snippet = (snippet[:1200] + "…") if len(snippet) > 1200 else snippet
+    except Exception:
+        snippet = "<body text unavailable>"
+    return RuntimeError(f"Missing selector for '{name}': {sel} ({err})\n\n[DEBUG SNIPPET]\n{snippet}")
 
 def _click_calculator(page: Page, timeout_ms: int = 15000):
     """
@@ -53,11 +99,11 @@ def _click_calculator(page: Page, timeout_ms: int = 15000):
     Primary: data-testid="calculator"
     Fallbacks try role/text.
     """
+    # click() auto-waits for the element to be visible and actionable, so no separate wait_for
     # Primary
     btn = page.locator('div[data-testid="calculator"]').first
     try:
-        btn.wait_for(state="visible", timeout=timeout_ms*2)
-        btn.click()
+        btn.click(timeout=timeout_ms*2)
         print("[info] Clicked Helium Profitability Calculator button.")
         return
     except Exception as e:
@@ -66,9 +112,8 @@ def _click_calculator(page: Page, timeout_ms: int = 15000):
 
     # Fallback by button role + text
     try:
-        alt = page.get_by_role("button", name=re.compile(r"profitability|calculator", re.I)).first
-        alt.wait_for(timeout=20000)
-        alt.click()
+        alt = page.get_by_role("button", name=_CALC_BTN_RE).first
+        alt.click(timeout=20000)
         print("[info] Clicked Profitability Calculator (fallback).")
         return
     except Exception as e:
@@ -78,8 +123,7 @@ def _click_calculator(page: Page, timeout_ms: int = 15000):
     # Last ditch: any element with calculator text
     try:
         any_calc = page.locator(":is(div,button,span,a):has-text('Calculator')").first
-        any_calc.wait_for(state="visible", timeout=20000)
-        any_calc.click()
+        any_calc.click(timeout=20000)
         print("[info] Clicked Calculator (text fallback).")
         return
     except Exception as e:
@@ -88,37 +132,40 @@ def _click_calculator(page: Page, timeout_ms: int = 15000):
 
     raise RuntimeError("Could not find/click the Profitability Calculator button.")
 
+def _fba_digits(value: str) -> str:
+    """value from its first digit on (drops a leading label/currency); value itself if it has no digit."""
+    m = _FBA_DIGIT_RE.search(value)
+    return m.group() if m else value
+
 def _get_fba_fees(page: Page, code) -> str:
     """
     FBA fees are sometimes rendered with volatile classes.
-    Try your original class selector, then fall back to a proximity search
-    around 'FBA Fees'.
+    Try the value next to the 'FBA Fees' label, then your original class selector, then fall
+    back to a proximity search around 'FBA Fees'.
     """
+    # Label-anchored
+    try:
+        el = page.locator(f"xpath={_FBA_VALUE_XPATH}").first
+        el.wait_for(timeout=2000)
+        value = (el.text_content() or "").strip()
+        if value:
+            return value if code == 'us' else _fba_digits(value)
+    except Exception:
+        pass
+
     # Original class-based selector (brittle but fast if it works)
     try:
         if code == 'us':
             el = page.locator("div.sc-gsnOKb.jESxTP").first
             el.wait_for(timeout=2000)
-            txt = (el.inner_text() or "").strip()
+            txt = (el.text_content() or "").strip()
             if txt:
                 return txt
         else:
-            if code == 'au':
-                locator = page.locator("div.sc-zbfRe.bUrasH").nth(8)
-            elif code == 'ca':
-                locator = page.locator("div.sc-zbfRe.bUrasH").nth(8)
-            elif code == 'ae':
-                locator = page.locator("div.sc-zbfRe.bUrasH").nth(8)
-            else:
-                locator = page.locator("div.sc-zbfRe.bUrasH").nth(11)
-            value = (locator.text_content()  or "").strip()
-            import re
-            match = re.search(r"\d.*", value)
-            if match:
-                return match.group()
-
+            locator = page.locator("div.sc-zbfRe.bUrasH").nth(_FBA_CLASS_INDEX.get(code, 11))
+            value = (locator.text_content(timeout=2000)  or "").strip()
             if value:
-                return value
+                return _fba_digits(value)
     except Exception as e:
         print("exc1FBA",e)
         pass
@@ -126,34 +173,10 @@ def _get_fba_fees(page: Page, code) -> str:
     # Proximity fallback near 'FBA Fees'
     try:
         label = page.get_by_text("FBA Fees", exact=False).first
-        label.wait_for(timeout=3000)
-        # climb ancestors and scan for a currency-looking piece of text
-        val = page.evaluate(
-            """
-            (labelEl) => {
-              const money = (t) => /^\\$?\\s*\\d[\\d,]*(?:\\.\\d+)?$/.test((t||"").trim());
-              function findCurrencyWithin(root) {
-                const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT);
-                while (walker.nextNode()) {
-                  const n = walker.currentNode;
-                  if (n === labelEl) continue;
-                  const txt = (n.innerText || "").trim();
-                  if (!txt || txt.length > 40) continue;
-                  if (money(txt)) return txt;
-                }
-                return null;
-              }
-              let root = labelEl.parentElement;
-              for (let i = 0; i < 6 && root; i++) {
-                const got = findCurrencyWithin(root);
-                if (got) return got;
-                root = root.parentElement;
-              }
-              return null;
-            }
-            """,
-            label.element_handle(),
-        )
+        # climb ancestors and scan for a currency-looking piece of text (one round trip: the
+        # locator's evaluate waits for the label and hands it over)
+        val = _eval_helper(label, "(el) => window.__profitcalMoneyNearLabel(el)", _MONEY_NEAR_LABEL_JS,
+                           timeout=3000)
         if val:
             return val.strip()
     except Exception as e:
@@ -162,10 +185,127 @@ def _get_fba_fees(page: Page, code) -> str:
 
     raise RuntimeError("Could not read FBA Fees from the calculator panel.")
 
+# Nearest currency-looking text around a label element, climbing up to 6 ancestors. The regex test on
+# textContent skips digit-less nodes before innerText, which forces a layout per node, is read.
+_MONEY_NEAR_LABEL_JS = r"""
+(labelEl) => {
+  const money = (t) => /^\$?\s*\d[\d,]*(?:\.\d+)?$/.test((t||"").trim());
+  function findCurrencyWithin(root) {
+    const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT);
+    while (walker.nextNode()) {
+      const n = walker.currentNode;
+      if (n === labelEl || !/\d/.test(n.textContent)) continue;
+      const txt = (n.innerText || "").trim();
+      if (!txt || txt.length > 40) continue;
+      if (money(txt)) return txt;
+    }
+    return null;
+  }
+  let root = labelEl.parentElement;
+  for (let i = 0; i < 6 && root; i++) {
+    const got = findCurrencyWithin(root);
+    if (got) return got;
+    root = root.parentElement;
+  }
+  return null;
+}
+"""
+
+# Every calculator field in one page.evaluate round trip, mirroring the per-field reads in
+# get_profitability_metrics / _get_fba_fees. A field that isn't rendered, or is still blank, comes
+# back null and is read again the slow (auto-waiting) way. Only fast codes have waited for the panel
+# by now; elsewhere a label/class/position lookup could land on a half-drawn panel, so for those
+# only the data-testid storage fields are read here.
+_READ_FIELDS_JS = r"""
+({code, fast, storageJanSep, storageOctDec, price, fbaXpath, fbaIndex}) => {
+  const trim = (t) => (t == null ? null : String(t).trim() || null);
+  const byXpath = (xp) => {
+    const n = document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return n ? trim(n.textContent) : null;
+  };
+  const cls = document.querySelectorAll("div.sc-zbfRe.bUrasH");
+  const clsText = (i) => (cls[i] ? trim(cls[i].textContent) : null);
+  // textContent, like the Python reads: no layout pass for these plain number fields
+  const text = (sel) => { const el = document.querySelector(sel); return el ? trim(el.textContent) : null; };
+  const out = {};
+
+  if (code !== "ae") {
+    out.storage_fee_jan_sep = text(storageJanSep);
+    out.storage_fee_oct_dec = text(storageOctDec);
+  }
+  if (!fast) return out;
+
+  const el = document.querySelector(price);
+  out.product_price = el ? trim(el.value) : null;
+
+  let fba = null;
+  if (code === "us") {
+    fba = byXpath(fbaXpath) || text("div.sc-gsnOKb.jESxTP") || null;
+  } else {
+    const v = byXpath(fbaXpath) || clsText(fbaIndex);
+    const m = v && v.match(/\d.*/);
+    fba = m ? m[0] : (v || null);
+  }
+  if (!fba) {
+    // proximity fallback near 'FBA Fees', as in _get_fba_fees
+    const texts = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    let labelEl = null;
+    while (!labelEl && texts.nextNode()) {
+      if (texts.currentNode.nodeValue.replace(/\s+/g, " ").toLowerCase().includes("fba fees")) {
+        labelEl = texts.currentNode.parentElement;
+      }
+    }
+    if (labelEl) fba = (__MONEY_NEAR_LABEL__)(labelEl);
+  }
+  out.fba_fees = fba;
+  return out;
+}
+""".replace("__MONEY_NEAR_LABEL__", _MONEY_NEAR_LABEL_JS.strip())
+
+# Both scripts are installed into every document of a calculator tab (add_init_script) and called
+# by name: the source crosses the wire once per tab and is compiled once per page load, not per call
+_HELPERS_JS = (f"window.__profitcalMoneyNearLabel = {_MONEY_NEAR_LABEL_JS.strip()};\n"
+               f"window.__profitcalReadFields = {_READ_FIELDS_JS.strip()};\n")
+
+def _install_helpers(page: Page):
+    if page not in _HELPER_PAGES:
+        page.add_init_script(script=_HELPERS_JS)
+        _HELPER_PAGES.add(page)
+
+def _eval_helper(target, call_expr: str, source: str, *args, **kwargs):
+    """target.evaluate(call_expr); the helper's full source instead if this document doesn't have it."""
+    try:
+        return target.evaluate(call_expr, *args, **kwargs)
+    except Exception as e:
+        if "is not a function" not in str(e):
+            raise
+        return target.evaluate(source, *args, **kwargs)
+
+def _read_fields(page: Page, code, selectors: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Snapshot of the calculator fields in one round trip; None for any field not on the page yet."""
+    try:
+        return _eval_helper(page, "(a) => window.__profitcalReadFields(a)", _READ_FIELDS_JS, {
+            "code": code,
+            "fast": code in _FAST_CODES,
+            "storageJanSep": selectors["storage_fee_jan_sep"],
+            "storageOctDec": selectors["storage_fee_oct_dec"],
+            "price": selectors["product_price"],
+            "fbaXpath": _FBA_VALUE_XPATH,
+            "fbaIndex": _FBA_CLASS_INDEX.get(code, 11),
+        })
+    except Exception as e:
+        print("[warn] Batched calculator read failed:", e)
+        return {}
+
+from functools import lru_cache
 from urllib.parse import urlparse
 
 def get_marketplace_code(url: str) -> str:
-    netloc = urlparse(url).netloc  # e.g. "www.amazon.co.uk"
+    return _marketplace_code_for_host(urlparse(url).netloc)  # e.g. "www.amazon.co.uk"
+
+# A batch only ever sees a handful of Amazon hosts
+@lru_cache(maxsize=64)
+def _marketplace_code_for_host(netloc: str) -> str:
     parts = netloc.split(".")
     if len(parts) < 2:
         return None
@@ -193,7 +333,8 @@ def get_profitability_metrics(
     wait_secs: int = 60,
     close_all_tabs_first: bool = False,
     close_others_after_open: bool = True,
-) -> Dict[str, Dict[str, str]]:
+    page: Optional[Page] = None,
+) -> Dict[str, Dict[str, Any]]:
     """
     Navigate to product_url, open Helium Profitability Calculator, and return:
       {
@@ -202,19 +343,34 @@ def get_profitability_metrics(
         "storage_fee_oct_dec": {"text": "$X.XX", "number": "X.XX"},
         "product_price": {"text": "123.45", "number": "123.45"}
       }
+    each also carries "value": Decimal("X.XX") (None if the number didn't parse), so callers
+    don't re-parse "number".
+    close_others_after_open costs one round trip per other tab (see CLOSE_OTHERS); callers that
+    want isolation without it should give each product its own BrowserContext instead.
+    page: tab to load the product in. By default the tab from the previous call on this same Browser
+    connection is reused (just navigated again), so a caller that keeps its connection across
+    products only pays for a new page once; one that connects per product reuses it on retries only.
     """
     if close_all_tabs_first:
         n = _close_all_tabs(browser)
         if n:
             print(f"[info] Closed {n} tab(s) before starting.")
 
-    ctx = _pick_ctx(browser)
-    page = ctx.new_page()
-    page.goto(product_url, wait_until="domcontentloaded")
+    page = page or _reusable_page(browser)
+    reused = page is not None
+    if not reused:
+        ctx = _pick_ctx(browser)
+        page = ctx.new_page()
+        _CALC_PAGES[browser] = page
+    # Return on the first response: _click_calculator's visible-wait on the Helium button is the
+    # real readiness gate, and tab cleanup below overlaps the rest of the load
+    _install_helpers(page)
+    page.goto(product_url, wait_until="commit")
     page.bring_to_front()
     print("[info] Opened Amazon product page (seed).")
 
-    if close_others_after_open:
+    # a reused tab already went through this on the call that opened it
+    if close_others_after_open and CLOSE_OTHERS and not reused:
         n = _close_others(browser, keep=page)
         if n:
             print(f"[info] Closed {n} other tab(s); only the product tab remains.")
@@ -231,33 +387,49 @@ def get_profitability_metrics(
 
 
     code = get_marketplace_code(product_url)
-    deadline = time.time() + wait_secs
-    last_err: Optional[Exception] = None
-    while time.time() < deadline:
+    timeout_ms = wait_secs * 1000
+    if code in _FAST_CODES:
+        # The panel renders its fields together, so only the first is waited for here; any field the
+        # snapshot below misses is waited for where it is read
+        sel = selectors["storage_fee_jan_sep"]
         try:
-            if code =='ae':
-                break
-            if code  in ['us','uk','de']:
-                _wait_for_all(page, selectors, timeout_ms=2500)
-            break
+            page.locator(sel).first.wait_for(timeout=timeout_ms)
         except Exception as e:
-            last_err = e
-            time.sleep(0.3)
-    else:
-        raise RuntimeError(f"Profitability Calculator UI did not appear in {wait_secs}s. Last error: {last_err}")
+            raise _missing_selector(page, "storage_fee_jan_sep", sel,
+                                    f"Profitability Calculator UI did not appear in {wait_secs}s: {e}")
 
-    # Extract values
+    # Extract values: one snapshot, then the auto-waiting per-field reads for anything it missed
+    fields = _read_fields(page, code, selectors)
     
-    if code == 'ae':
-        locator = page.locator("div.sc-zbfRe.bUrasH").nth(10)
-        value = (locator.text_content()  or "").strip()
+    if fields.get("storage_fee_jan_sep") is not None and fields.get("storage_fee_oct_dec") is not None:
+        storage_fee_jan_sep_text = fields["storage_fee_jan_sep"]
+        storage_fee_oct_dec_text = fields["storage_fee_oct_dec"]
+    elif code == 'ae':
+        try:
+            value = (page.locator(f"xpath={_STORAGE_VALUE_XPATH}").first.text_content(timeout=2000) or "").strip()
+        except Exception:
+            value = ""
+        if not value:
+            locator = page.locator("div.sc-zbfRe.bUrasH").nth(_AE_STORAGE_CLASS_INDEX)
+            value = (locator.text_content()  or "").strip()
         storage_fee_jan_sep_text = value
         storage_fee_oct_dec_text = value
     else:
-        storage_fee_jan_sep_text = (page.locator(selectors["storage_fee_jan_sep"]).inner_text() or "").strip()
-        storage_fee_oct_dec_text = (page.locator(selectors["storage_fee_oct_dec"]).inner_text() or "").strip()
-    if code in ['us','uk','de']:
-        product_price_text = (page.locator(selectors["product_price"]).input_value() or "").strip()
+        texts = {}
+        for name in ("storage_fee_jan_sep", "storage_fee_oct_dec"):
+            try:
+                texts[name] = (page.locator(selectors[name]).text_content(timeout=timeout_ms) or "").strip()
+            except Exception as e:
+                raise _missing_selector(page, name, selectors[name], e)
+        storage_fee_jan_sep_text = texts["storage_fee_jan_sep"]
+        storage_fee_oct_dec_text = texts["storage_fee_oct_dec"]
+    if fields.get("product_price") is not None:
+        product_price_text = fields["product_price"]
+    elif code in _FAST_CODES:
+        try:
+            product_price_text = (page.locator(selectors["product_price"]).input_value(timeout=timeout_ms) or "").strip()
+        except Exception as e:
+            raise _missing_selector(page, "product_price", selectors["product_price"], e)
     else:
         container = page.locator("div:has(> input)").filter(
             has=page.locator("//div[contains(@class,'sc-kdYKFS') and contains(@class,'lgKsUy')]")
@@ -269,25 +441,13 @@ def get_profitability_metrics(
         # locator = page.locator("div.sc-kdYKFS.lgKsUy").first
         # product_price_text = (locator.text_content() or "").strip()
         
-    fba_fees_text = _get_fba_fees(page, code)
+    fba_fees_text = fields.get("fba_fees") or _get_fba_fees(page, code)
 
     result = {
-        "fba_fees": {
-            "text": fba_fees_text,
-            "number": _clean_currency(fba_fees_text),
-        },
-        "storage_fee_jan_sep": {
-            "text": storage_fee_jan_sep_text,
-            "number": _clean_currency(storage_fee_jan_sep_text),
-        },
-        "storage_fee_oct_dec": {
-            "text": storage_fee_oct_dec_text,
-            "number": _clean_currency(storage_fee_oct_dec_text),
-        },
-        "product_price": {
-            "text": product_price_text,
-            "number": _clean_currency(product_price_text),
-        },
+        "fba_fees": _metric(fba_fees_text),
+        "storage_fee_jan_sep": _metric(storage_fee_jan_sep_text),
+        "storage_fee_oct_dec": _metric(storage_fee_oct_dec_text),
+        "product_price": _metric(product_price_text),
     }
 
     print("[info] Profitability metrics captured.")
@@ -1,22 +1,42 @@
-import os,re
+import os,re, time, random, threading, queue
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache, wraps
+from operator import itemgetter
+from types import MappingProxyType
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv, find_dotenv
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-
-# Load .env (override current env if present)
-load_dotenv(find_dotenv(), override=True)
+from google.auth.transport.requests import AuthorizedSession, Request
+from requests import HTTPError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # === ENV ===
 SPREADSHEET_ID = None
-EXISTING_SELLER_SPREADSHEET_ID = os.getenv("EXISTING_SELLER_SPREADSHEET_ID", "").strip()
-NEW_SELLER_SPREADSHEET_ID= os.getenv("NEW_SELLER_SPREADSHEET_ID", "").strip()
-VENDOR_SPREADSHEET_ID=os.getenv("VENDOR_SPREADSHEET_ID", "").strip()
 
-GOOGLE_CLIENT_EMAIL = os.getenv("GOOGLE_CLIENT_EMAIL", "").strip()
-GOOGLE_PRIVATE_KEY = (os.getenv("GOOGLE_PRIVATE_KEY", "") or "").replace("\\n", "\n")
+@lru_cache(maxsize=1)
+def _env() -> Dict[str, str]:
+    """
+    Resolve env vars on first use instead of at import. .env is only searched for when the
+    process env doesn't already carry the credentials (it never overrides exported values).
+    """
+    if not os.getenv("GOOGLE_CLIENT_EMAIL"):
+        load_dotenv(find_dotenv(), override=False)
+    return {
+        "EXISTING_SELLER_SPREADSHEET_ID": os.getenv("EXISTING_SELLER_SPREADSHEET_ID", "").strip(),
+        "NEW_SELLER_SPREADSHEET_ID":      os.getenv("NEW_SELLER_SPREADSHEET_ID", "").strip(),
+        "VENDOR_SPREADSHEET_ID":          os.getenv("VENDOR_SPREADSHEET_ID", "").strip(),
+        "GOOGLE_CLIENT_EMAIL":            os.getenv("GOOGLE_CLIENT_EMAIL", "").strip(),
+        "GOOGLE_PRIVATE_KEY":             (os.getenv("GOOGLE_PRIVATE_KEY", "") or "").replace("\\n", "\n"),
+        # "1" routes Sheets calls over HTTP/2 (needs `pip install "httpx[http2]"`); default stays on requests
+        "SHEETS_HTTP2":                   os.getenv("SHEETS_HTTP2", "").strip(),
+    }
+
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+SHEETS_API = "https://sheets.googleapis.com/v4/spreadsheets"
+HTTP_TIMEOUT = 60
 
 # === COLUMNS (zero-indexed) ===
 COL_NO                  = 0
@@ -43,14 +63,45 @@ ORIGINAL_COL_UNITS_20          = 18
 ORIGINAL_COL_UNITS_15          = 22
 ORIGINAL_COL_UNITS_10          = 26
 
-AFFECTED_COLS = [
-    COL_UNITS_10, COL_UNITS_15, COL_UNITS_20
-]
+# Countries whose tabs use the narrower layout, per seller type (anything else shifts right)
+HOME_MARKETS = {
+    "vendor":          ("US", "CAN"),
+    "existing_seller": ("US", "CAN", "AUS"),
+    "new_seller":      ("US", "CAN", "AUS"),
+}
+
+# (seller_type, "home" | "other") -> final (COL_UNITS_10, COL_UNITS_15, COL_UNITS_20) for the row builder
+OFFSET_TABLE = {
+    (seller_type, bucket): (ORIGINAL_COL_UNITS_20 + off, ORIGINAL_COL_UNITS_15 + off, ORIGINAL_COL_UNITS_10 + off)
+    for (seller_type, bucket), off in {
+        ("vendor", "home"): 2,           ("vendor", "other"): 3,
+        ("existing_seller", "home"): 0,  ("existing_seller", "other"): 1,
+        ("new_seller", "home"): -2,      ("new_seller", "other"): -1,
+    }.items()
+}
+
+# GPT projection keys, in the same order as the OFFSET_TABLE column tuple
+UNITS_FIELDS = ("high_total_sales", "base_total_sales", "low_total_sales")
+_UNITS_GETTER = itemgetter(*UNITS_FIELDS)
+
+# Shared read-only stand-in for missing nested dicts (no throwaway {} per lookup)
+SENTINEL_DICT = MappingProxyType({})
+
+_NON_NUMERIC_RE = re.compile(r'[^0-9.,]')
 
 # total columns per row (0..31 inclusive) — adjust if your sheet is wider
 ROW_WIDTH = 32
 
-# Which columns we’ll format (bg black + font white) after writing:
+# Country tabs are flushed in parallel; writes stay under the per-user Sheets quota
+MAX_WRITE_WORKERS       = 8
+WRITE_QUOTA_PER_MIN     = 60
+RETRY_STATUSES          = (429, 503)
+MAX_RETRIES             = 6
+# Concurrent batchUpdates arriving within this window are merged into one HTTP call
+COMBINE_WINDOW_S        = 0.2
+
+# Which columns we’ll format (bg black + font white) after writing; the units columns
+# are replaced per layout by _format_cols, this list itself is never mutated
 FILLED_COLS = [
     COL_NO, COL_CATEGORY, COL_PRODUCTS, COL_CURRENT_MREV, COL_MONTHLY_MARKETCAP_1,
     # COL_YOUR_COMPETITOR, COL_COMP_MREV, COL_YOUR_PRICE, COL_FBA_FEES, COL_STORAGE_FEES,
@@ -60,56 +111,302 @@ FILLED_COLS = [
 def get_sheets_config():
     return SCOPES,  ROW_WIDTH
 # === Google Sheets Helpers ===
-def _sheets_service():
-    if not (SPREADSHEET_ID and GOOGLE_CLIENT_EMAIL and GOOGLE_PRIVATE_KEY):
-        raise RuntimeError("Missing SPREADSHEET_ID / GOOGLE_CLIENT_EMAIL / GOOGLE_PRIVATE_KEY.")
-    creds = service_account.Credentials.from_service_account_info(
+# Sheets REST is called directly over one pooled requests.Session (no discovery doc, keep-alive sockets)
+_SESSION = None
+_session_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _credentials():
+    """Service-account credentials, built once; google-auth refreshes the token in place."""
+    return service_account.Credentials.from_service_account_info(
         {
             "type": "service_account",
-            "client_email": GOOGLE_CLIENT_EMAIL,
-            "private_key": GOOGLE_PRIVATE_KEY,
+            "client_email": _env()["GOOGLE_CLIENT_EMAIL"],
+            "private_key": _env()["GOOGLE_PRIVATE_KEY"],
             "token_uri": "https://oauth2.googleapis.com/token",
         },
         scopes=SCOPES,
     )
-    return build("sheets", "v4", credentials=creds)
+
+class _Http2Response:
+    """Wraps an httpx response so callers (and sheets_call) see the requests API they expect."""
+    def __init__(self, resp):
+        self._resp = resp
+        self.status_code = resp.status_code
+        self.request = resp.request
+
+    def json(self):
+        return self._resp.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError(f"{self.status_code} Error for url: {self._resp.url}", response=self)
+
+class _Http2Session:
+    """
+    Minimal AuthorizedSession stand-in over httpx with HTTP/2, enabled by SHEETS_HTTP2=1.
+    The write workers then multiplex their calls as streams on one connection instead of
+    queueing behind each other on separate HTTP/1.1 sockets.
+    """
+    def __init__(self, credentials):
+        import httpx  # optional dependency, only needed when the flag is on
+
+        self._creds = credentials
+        self._refresh_lock = threading.Lock()
+        limits = httpx.Limits(max_connections=32)
+        self._client = httpx.Client(
+            http2=True,
+            limits=limits,
+            timeout=HTTP_TIMEOUT,
+            # connection errors only; 429/503 are left to sheets_call
+            transport=httpx.HTTPTransport(http2=True, retries=3, limits=limits),
+            # Google only gzips responses when the User-Agent also says "gzip"
+            headers={"Accept-Encoding": "gzip", "User-Agent": "sheet-writer (gzip)"},
+        )
+
+    def _auth_headers(self) -> Dict[str, str]:
+        with self._refresh_lock:
+            if not self._creds.valid:
+                self._creds.refresh(Request())
+            return {"Authorization": f"Bearer {self._creds.token}"}
+
+    def _send(self, method: str, url: str, params=None, json=None, timeout=None) -> _Http2Response:
+        r = self._client.request(method, url, params=params, json=json,
+                                 headers=self._auth_headers(), timeout=timeout or HTTP_TIMEOUT)
+        return _Http2Response(r)
+
+    def get(self, url: str, params=None, timeout=None) -> _Http2Response:
+        return self._send("GET", url, params=params, timeout=timeout)
+
+    def post(self, url: str, params=None, json=None, timeout=None) -> _Http2Response:
+        return self._send("POST", url, params=params, json=json, timeout=timeout)
+
+def _http2_session(credentials) -> Optional[_Http2Session]:
+    try:
+        session = _Http2Session(credentials)
+    except ImportError:
+        print('[SHEETS] SHEETS_HTTP2=1 but httpx[http2] is not installed; using HTTP/1.1')
+        return None
+    print("[SHEETS] Using HTTP/2 transport")
+    return session
+
+def _get_session() -> AuthorizedSession:
+    """Shared authorized session; urllib3 pools connections across brands and worker threads."""
+    global _SESSION
+    if not (SPREADSHEET_ID and _env()["GOOGLE_CLIENT_EMAIL"] and _env()["GOOGLE_PRIVATE_KEY"]):
+        raise RuntimeError("Missing SPREADSHEET_ID / GOOGLE_CLIENT_EMAIL / GOOGLE_PRIVATE_KEY.")
+    with _session_lock:
+        if _SESSION is None and _env()["SHEETS_HTTP2"] == "1":
+            _SESSION = _http2_session(_credentials())
+        if _SESSION is None:
+            session = AuthorizedSession(_credentials())
+            # Google only gzips responses when the User-Agent also says "gzip"
+            session.headers["Accept-Encoding"] = "gzip"
+            session.headers["User-Agent"] = f'{session.headers.get("User-Agent", "python-requests")} (gzip)'
+            # urllib3 only retries idempotent reads (never POST) on 5xx; 429/503 are left to sheets_call
+            session.mount("https://", HTTPAdapter(
+                pool_connections=16,
+                pool_maxsize=64,
+                max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[500, 502, 504],
+                                  raise_on_status=False),
+            ))
+            _SESSION = session
+    return _SESSION
+
+_write_times = deque()
+_write_lock = threading.Lock()
+
+def _throttle_write():
+    """Sliding-window limiter shared by all workers: at most WRITE_QUOTA_PER_MIN writes per 60s."""
+    with _write_lock:
+        now = time.monotonic()
+        while _write_times and now - _write_times[0] >= 60:
+            _write_times.popleft()
+        if len(_write_times) >= WRITE_QUOTA_PER_MIN:
+            time.sleep(60 - (now - _write_times[0]))
+            _write_times.popleft()
+        _write_times.append(time.monotonic())
+
+def sheets_call(fn):
+    """Retry a single Sheets HTTP call on 429/503 with exponential backoff + jitter (up to MAX_RETRIES attempts)."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(MAX_RETRIES):
+            try:
+                return fn(*args, **kwargs)
+            except HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in RETRY_STATUSES or attempt == MAX_RETRIES - 1:
+                    raise
+                wait = (2 ** attempt) + random.random()
+                print(f"[SHEETS] HTTP {status} from {fn.__name__}, retrying in {wait:.1f}s")
+                time.sleep(wait)
+    return wrapper
+
+# Write replies are never read beyond success, so ask for a near-empty response body
+_WRITE_RESPONSE_FIELDS = {":batchUpdate": "spreadsheetId", "/values:batchUpdate": "totalUpdatedCells"}
+
+@sheets_call
+def _sheets_get(session, path: str = "", params: Optional[Dict[str, Any]] = None,
+                spreadsheet_id: Optional[str] = None) -> Dict[str, Any]:
+    """GET {SHEETS_API}/{spreadsheet_id}{path} and return the parsed JSON body."""
+    sid = spreadsheet_id or SPREADSHEET_ID
+    r = session.get(f"{SHEETS_API}/{sid}{path}", params=params, timeout=HTTP_TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+@sheets_call
+def _sheets_post(session, path: str, body: Dict[str, Any],
+                 spreadsheet_id: Optional[str] = None) -> Dict[str, Any]:
+    """POST a JSON write to {SHEETS_API}/{spreadsheet_id}{path} under the write limiter."""
+    sid = spreadsheet_id or SPREADSHEET_ID
+    _throttle_write()
+    params = {"fields": _WRITE_RESPONSE_FIELDS[path]} if path in _WRITE_RESPONSE_FIELDS else None
+    r = session.post(f"{SHEETS_API}/{sid}{path}", params=params, json=body, timeout=HTTP_TIMEOUT)
+    r.raise_for_status()
+    return r.json()
+
+class _BatchCombiner:
+    """
+    Flat combining for batch writes: worker threads hand their batchUpdate bodies to one
+    flusher thread, which waits up to COMBINE_WINDOW_S for more and sends everything aimed
+    at the same spreadsheet/endpoint as a single HTTP call. Each caller blocks until its
+    combined call finishes (and sees its result or exception), so per-tab ordering holds.
+    """
+    # endpoint -> list field that is concatenated when bodies are merged
+    MERGE_KEYS = {":batchUpdate": "requests", "/values:batchUpdate": "data"}
+
+    def __init__(self, window_s: float = COMBINE_WINDOW_S):
+        self._window_s = window_s
+        self._q = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        fut = Future()
+        self._q.put((SPREADSHEET_ID, path, body, fut))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sheets-combiner", daemon=True)
+                self._thread.start()
+        return fut.result()
+
+    def _run(self):
+        while True:
+            batch = [self._q.get()]
+            deadline = time.monotonic() + self._window_s
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups: Dict[tuple, List[tuple]] = {}
+            for sid, path, body, fut in batch:
+                others = tuple(sorted((k, str(v)) for k, v in body.items() if k != self.MERGE_KEYS[path]))
+                groups.setdefault((sid, path, others), []).append((body, fut))
+
+            for (sid, path, _), items in groups.items():
+                key = self.MERGE_KEYS[path]
+                merged = dict(items[0][0])
+                merged[key] = [x for body, _ in items for x in body[key]]
+                try:
+                    resp = _sheets_post(_get_session(), path, merged, spreadsheet_id=sid)
+                except Exception as e:
+                    for _, fut in items:
+                        fut.set_exception(e)
+                else:
+                    for _, fut in items:
+                        fut.set_result(resp)
+
+_COMBINER = _BatchCombiner()
 
 def _esc(s: str) -> str:
     return str(s or "").replace('"', '""')
 
+@lru_cache(maxsize=1024)
 def _hyper(url: str, text: Optional[str] = "link") -> str:
+    # Cached: the same category link repeats for every product of a keyword
     url = str(url or "")
-    return f'=HYPERLINK("{_esc(url)}","{_esc(text or "link")}")' if url else ""
-
-def _get_sheet_id_and_cols(svc, title: str):
-    meta = svc.spreadsheets().get(spreadsheetId=SPREADSHEET_ID).execute()
-    for sh in meta.get("sheets", []):
-        props = sh.get("properties", {})
-        if props.get("title") == title:
+    if not url:
+        return ""
+    text = str(text or "link")
+    if '"' not in url and '"' not in text:
+        return f'=HYPERLINK("{url}","{text}")'
+    return f'=HYPERLINK("{_esc(url)}","{_esc(text)}")'
+
+# {spreadsheet_id: {title: (sheet_id, column_count, row_count)}} — tab layout is static during a run,
+# except for the rows this writer inserts itself (row_count is bumped locally for those)
+_SHEET_META: Dict[str, Dict[str, tuple]] = {}
+_SHEET_META_FIELDS = "sheets.properties(sheetId,title,gridProperties(rowCount,columnCount))"
+
+def _sheet_tabs(session, refresh: bool = False) -> Dict[str, tuple]:
+    """Tab metadata for the current spreadsheet, fetched once (partial response) and then served from cache."""
+    tabs = _SHEET_META.get(SPREADSHEET_ID)
+    if tabs is None or refresh:
+        meta = _sheets_get(session, params={"fields": _SHEET_META_FIELDS})
+        tabs = {}
+        for sh in meta.get("sheets", []):
+            props = sh.get("properties", {})
             grid = props.get("gridProperties", {}) or {}
-            return props.get("sheetId"), grid.get("columnCount", ROW_WIDTH)
+            tabs[props.get("title")] = (props.get("sheetId"), grid.get("columnCount", ROW_WIDTH), grid.get("rowCount"))
+        _SHEET_META[SPREADSHEET_ID] = tabs
+    return tabs
+
+def _get_sheet_id_and_cols(session, title: str):
+    # A miss may mean the tab was added mid-run, so refetch once before giving up
+    for refresh in (False, True):
+        tabs = _sheet_tabs(session, refresh=refresh)
+        if title in tabs:
+            return tabs[title][:2]
     raise ValueError(f'Sheet/tab "{title}" not found.')
 
-def _first_empty_row(svc, title: str, col_letter: str = "A") -> int:
-    """Find first empty row by scanning from row 1 down in the target column (returns 1-based index)."""
-    rng = f"{title}!{col_letter}1:{col_letter}"
-    r = svc.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=rng).execute()
-    used = len(r.get("values", []) or [])
-    return used + 1
-
-def _next_no_value(svc, title: str) -> int:
-    """Reads column A to get last numeric 'No.' and increments it. If none, starts at 1."""
-    rng = f"{title}!A1:A"
-    r = svc.spreadsheets().values().get(spreadsheetId=SPREADSHEET_ID, range=rng).execute()
-    vals = [row[0] for row in (r.get("values", []) or []) if row]
-    last_num = 0
-    for v in reversed(vals):
+def _bump_row_count(title: str, n_rows: int):
+    """Account for rows we inserted so the cached gridProperties.rowCount stays exact."""
+    tabs = _SHEET_META.get(SPREADSHEET_ID, {})
+    if title in tabs and tabs[title][2] is not None:
+        sheet_id, col_count, row_count = tabs[title]
+        tabs[title] = (sheet_id, col_count, row_count + n_rows)
+
+def _read_col_a_for_tabs(session, titles: List[str]) -> Dict[str, List[str]]:
+    """
+    Read column A of every tab in one values.batchGet, bounded by each tab's cached rowCount.
+    Returns {title: col_a} where 1-based row i -> col_a[i-1]; values are unformatted (numbers stay
+    numbers) and blank cells inside the column come back as "".
+    """
+    if not titles:
+        return {}
+    tabs = _SHEET_META.get(SPREADSHEET_ID, {})
+    ranges = []
+    for t in titles:
+        row_count = tabs[t][2] if t in tabs else None
+        ranges.append(f"{t}!A1:A{row_count}" if row_count else f"{t}!A1:A")
+    r = _sheets_get(session, "/values:batchGet", params={
+        "ranges": ranges,
+        "majorDimension": "COLUMNS",     # one flat list per tab instead of one list per row
+        "valueRenderOption": "UNFORMATTED_VALUE",
+        "fields": "valueRanges.values",
+    })
+    # valueRanges come back in the same order as the requested ranges
+    out = {}
+    for title, vr in zip(titles, r.get("valueRanges", []) or []):
+        cols = vr.get("values", []) or []
+        out[title] = cols[0] if cols else []
+    return out
+
+def _last_no_value(col_a: List[Any]) -> int:
+    """Last numeric 'No.' in column A (unformatted: ints/floats or text), or 0 if there is none."""
+    for v in reversed(col_a):
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            return int(v)
         try:
-            last_num = int(str(v).strip())
-            break
+            return int(str(v).strip())
         except Exception:
             continue
-    return last_num + 1 if last_num >= 0 else 1
+    return 0
 
 def _num_to_col(n0: int) -> str:
     n = n0 + 1
@@ -119,68 +416,70 @@ def _num_to_col(n0: int) -> str:
         s = chr(65 + rem) + s
     return s
 
-def _write_row(svc, title: str, row1: int, row_vals: List[str]):
-    last_col_letter = _num_to_col(ROW_WIDTH - 1)
-    rng = f"{title}!A{row1}:{last_col_letter}{row1}"
-    svc.spreadsheets().values().update(
-        spreadsheetId=SPREADSHEET_ID,
-        range=rng,
-        valueInputOption="USER_ENTERED",
-        body={"values": [row_vals]},
-    ).execute()
-
-def _insert_duplicate_of_last_row(svc, sheet_id: int, title: str, column_count: int) -> int:
+# Column letters for every index in a row, computed once (the row builders only emit indexes < ROW_WIDTH)
+COL_LETTERS = [_num_to_col(i) for i in range(ROW_WIDTH)]
+ROW_RANGE_LAST = COL_LETTERS[ROW_WIDTH - 1]
+
+def _write_row(session, title: str, row1: int, row_vals: List[str]):
+    rng = f"{title}!A{row1}:{ROW_RANGE_LAST}{row1}"
+    # values:batchUpdate with one range == values.update, without URL-encoding the A1 range into the path
+    _sheets_post(session, "/values:batchUpdate", {
+        "valueInputOption": "USER_ENTERED",
+        "data": [{"range": rng, "values": [row_vals]}],
+    })
+
+def _append_rows_requests(sheet_id: int, template_row1: int, n_rows: int, column_count: int) -> List[dict]:
     """
-    Finds the last filled row in the sheet, inserts a new row directly *below* it,
-    duplicates (values + formulas + formats) from that last row into the new row,
-    and returns the new row index (1-based).
+    Requests that insert n_rows directly *below* template_row1 (the last filled row) and
+    duplicate (values + formulas + formats) that row into all of them with a single copyPaste
+    (a destination taller than the source repeats it). New rows are template_row1+1 .. template_row1+n_rows.
+
+    values.append(insertDataOption=INSERT_ROWS) is deliberately not used instead: it can only
+    write literal cells, so the template row's formulas in the columns we leave empty would be
+    lost. With the row indexes already known locally, insert + copyPaste ride in the tab's single
+    batchUpdate and the values in its single values.batchUpdate, so append would not save a call.
     """
-    # last filled (1-based)
-    first_empty_row1 = _first_empty_row(svc, title, col_letter="A")
-    last_filled_row1 = first_empty_row1 - 1
-    if last_filled_row1 < 1:
-        # Nothing to duplicate; insert at top and just return row 1
-        requests = [{
+    if n_rows < 1:
+        return []
+    if template_row1 < 1:
+        # Nothing to duplicate; insert at top (new rows start at row 1)
+        return [{
             "insertDimension": {
-                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": 0, "endIndex": 1},
+                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": 0, "endIndex": n_rows},
                 "inheritFromBefore": False
             }
         }]
-        svc.spreadsheets().batchUpdate(spreadsheetId=SPREADSHEET_ID, body={"requests": requests}).execute()
-        return 1
 
-    # We want a new row BELOW last_filled_row1
-    # Insert at 0-based startIndex == last_filled_row1 to place a new row at (last_filled_row1+1) (1-based)
-    insert_row0 = last_filled_row1
-    new_row1 = last_filled_row1 + 1
+    # Insert at 0-based startIndex == template_row1 to place the new rows at (template_row1+1 ..) (1-based)
+    insert_row0 = template_row1
 
-    requests = [
-        # Insert a blank row below the last filled row
+    return [
+        # Insert the blank rows below the template row, inheriting its formatting
         {
             "insertDimension": {
                 "range": {
                     "sheetId": sheet_id,
                     "dimension": "ROWS",
                     "startIndex": insert_row0,
-                    "endIndex": insert_row0 + 1
+                    "endIndex": insert_row0 + n_rows
                 },
-                "inheritFromBefore": False
+                "inheritFromBefore": True
             }
         },
-        # Copy EVERYTHING from the last filled row to the new row (values + formulas + formats)
+        # Copy EVERYTHING from the template row to the new rows (values + formulas + formats)
         {
             "copyPaste": {
                 "source": {
                     "sheetId": sheet_id,
-                    "startRowIndex": last_filled_row1 - 1,  # 0-based
-                    "endRowIndex":   last_filled_row1,      # exclusive
+                    "startRowIndex": template_row1 - 1,     # 0-based
+                    "endRowIndex":   template_row1,         # exclusive
                     "startColumnIndex": 0,
                     "endColumnIndex": column_count
                 },
                 "destination": {
                     "sheetId": sheet_id,
-                    "startRowIndex": new_row1 - 1,          # 0-based
-                    "endRowIndex":   new_row1,
+                    "startRowIndex": insert_row0,           # 0-based
+                    "endRowIndex":   insert_row0 + n_rows,
                     "startColumnIndex": 0,
                     "endColumnIndex": column_count
                 },
@@ -190,38 +489,33 @@ def _insert_duplicate_of_last_row(svc, sheet_id: int, title: str, column_count:
         }
     ]
 
-    svc.spreadsheets().batchUpdate(
-        spreadsheetId=SPREADSHEET_ID,
-        body={"requests": requests}
-    ).execute()
-
-    return new_row1
-
-def _write_partial_cells(svc, title: str, row1: int, col_to_value: Dict[int, str]):
+def _partial_cells_data(title: str, row1: int, col_to_value: Dict[int, str]) -> List[dict]:
     """
-    Update only the given cells in a row (1-based row index).
+    values.batchUpdate `data` entries for only the given cells in a row (1-based row index).
     Keys in col_to_value are 0-based column indices.
     """
-    if not col_to_value:
-        return
     data = []
     for c_idx, val in col_to_value.items():
         # Only write non-empty values; skip empty strings to preserve existing formulas
         if val == "":
             continue
-        a1 = f"{title}!{_num_to_col(c_idx)}{row1}:{_num_to_col(c_idx)}{row1}"
+        col = COL_LETTERS[c_idx]
+        a1 = f"{title}!{col}{row1}:{col}{row1}"
         data.append({"range": a1, "values": [[val]]})
+    return data
 
-    if not data:
-        return
-
-    svc.spreadsheets().values().batchUpdate(
-        spreadsheetId=SPREADSHEET_ID,
-        body={"valueInputOption": "USER_ENTERED", "data": data}
-    ).execute()
+def _flush_country_batch(requests: List[dict], values_data: List[dict]):
+    """
+    Send a country's queued structural/format requests, then its cell values (2 calls total).
+    Runs on worker threads; concurrent tabs of the same spreadsheet get merged by _COMBINER.
+    """
+    if requests:
+        _COMBINER.submit(":batchUpdate", {"requests": requests, "includeSpreadsheetInResponse": False})
+    if values_data:
+        _COMBINER.submit("/values:batchUpdate", {"valueInputOption": "USER_ENTERED", "data": values_data})
 
 
-def _insert_row_and_copy_template_format(svc, sheet_id: int, insert_row0: int, column_count: int):
+def _insert_row_and_copy_template_format(session, sheet_id: int, insert_row0: int, column_count: int):
     """
     Insert a new row at row index insert_row0 (0-based).
     After insert, the original template row moves down to insert_row0+1.
@@ -302,23 +596,30 @@ def _insert_row_and_copy_template_format(svc, sheet_id: int, insert_row0: int, c
     ]
 
     # Run the batch update
-    svc.spreadsheets().batchUpdate(
-        spreadsheetId=SPREADSHEET_ID,
-        body={"requests": requests}
-    ).execute()
+    _sheets_post(session, ":batchUpdate", {"requests": requests, "includeSpreadsheetInResponse": False})
+
+def _col_runs(col_indices: List[int]) -> List[tuple]:
+    """Coalesce column indices into sorted, contiguous [start, end) runs, e.g. [0,1,2,5] -> [(0,3),(5,6)]."""
+    runs = []
+    for c in sorted(set(col_indices)):
+        if runs and runs[-1][1] == c:
+            runs[-1][1] = c + 1
+        else:
+            runs.append([c, c + 1])
+    return [tuple(r) for r in runs]
 
-def _format_cells_black_bg_white_font(svc, sheet_id: int, row0: int, col_indices: List[int]):
-    """Set background black + font white for specific cells (one row)."""
+def _black_bg_white_font_requests(sheet_id: int, start_row0: int, end_row0: int, col_indices: List[int]) -> List[dict]:
+    """repeatCell requests that set background black + font white on col_indices for rows [start_row0, end_row0)."""
     requests = []
-    for c in col_indices:
+    for start_col, end_col in _col_runs(col_indices):
         requests.append({
             "repeatCell": {
                 "range": {
                     "sheetId": sheet_id,
-                    "startRowIndex": row0,
-                    "endRowIndex": row0 + 1,
-                    "startColumnIndex": c,
-                    "endColumnIndex": c + 1,
+                    "startRowIndex": start_row0,
+                    "endRowIndex": end_row0,
+                    "startColumnIndex": start_col,
+                    "endColumnIndex": end_col,
                 },
                 "cell": {
                     "userEnteredFormat": {
@@ -329,144 +630,66 @@ def _format_cells_black_bg_white_font(svc, sheet_id: int, row0: int, col_indices
                 "fields": "userEnteredFormat(backgroundColor,textFormat.foregroundColor)"
             }
         })
-    svc.spreadsheets().batchUpdate(
-        spreadsheetId=SPREADSHEET_ID,
-        body={"requests": requests}
-    ).execute()
+    return requests
 
 # === Row Builder ===
-def _build_row_from_product(prod: Dict[str, Any],seller_type:str,country:str) -> List[str]:
-    """Build a 32-column row with only specified columns filled; others empty."""
-    global AFFECTED_COLS
-    row = [""] * ROW_WIDTH
+def _dig(d: Any, *keys: str, default: Any = "") -> Any:
+    """Walk nested dict keys; any missing/None step short-circuits to default."""
+    try:
+        for k in keys:
+            d = d[k]
+    except (KeyError, TypeError):
+        return default
+    return default if d is None else d
+
+def _units_cols(seller_type: str, country: str):
+    """(COL_UNITS_10, COL_UNITS_15, COL_UNITS_20) for this seller type / country layout."""
+    if seller_type not in ("vendor", "existing_seller"):
+        seller_type = "new_seller"
+    bucket = "home" if country in HOME_MARKETS[seller_type] else "other"
+    return OFFSET_TABLE[(seller_type, bucket)]
+
+def _format_cols(seller_type: str, country: str) -> List[int]:
+    """Columns the builder fills for this layout (and that get black bg + white font), without touching FILLED_COLS."""
+    if seller_type == "new_seller":
+        return [COL_NO, COL_CATEGORY, COL_PRODUCTS, COL_CURRENT_MREV, COL_MONTHLY_MARKETCAP_1+1]
+    return FILLED_COLS[:-3] + list(_units_cols(seller_type, country))
+
+def _build_row_from_product(prod: Dict[str, Any],seller_type:str,country:str) -> Dict[int, str]:
+    """Build {col_idx: value} for the populated columns only; every other cell is left untouched."""
+    row: Dict[int, str] = {}
 
     productname = prod.get("productname") or ""
     url         = prod.get("url") or ""
     keyword     = prod.get("keyword") or ""
     categoryUrl = prod.get("categoryUrl") or ""
-    res         = prod.get("result", {}) or {}
-
+    res         = prod.get("result") or SENTINEL_DICT
 
     # Sources
-    cat_rev_text = res.get("category_revenue", {}).get("text") or ""
-    monthly_meta = res.get("monthly_revenue", {}).get("meta", {}) or {}
-    monthly_parent_rev_text = monthly_meta.get("parent_level_revenue_text") or ""
-    cat_rev_text = re.sub(r'[^0-9.,]', '', cat_rev_text)
-    monthly_parent_rev_text = re.sub(r'[^0-9.,]', '', monthly_parent_rev_text)
-
-    # cf          = res.get("competitors_flow", {}) or {}
-    # picker_best = cf.get("picker_best", {}) or {}
-    # raw_result  = cf.get("raw_result", {}) or {}
-
-    # # Fallbacks for competitor fields
-    # comp_title = picker_best.get("product_details") or raw_result.get("product_details") or ""
-    # comp_url   = picker_best.get("url")            or raw_result.get("url")            or ""
-    # comp_mrev  = picker_best.get("parent_level_revenue") or raw_result.get("parent_level_revenue") or ""
-
-    # pm = res.get("profitability_metrics", {}) or {}
-    # price_text   = (pm.get("product_price", {}) or {}).get("text") or ""
-    # fba_text     = (pm.get("fba_fees", {}) or {}).get("text") or ""
-    # today = datetime.now()
-    # is_oct__nov_dec = today.month>=10
-    # if is_oct__nov_dec:
-    #     storage_fee_text = pm.get("storage_fee_oct_dec", {}).get("text") or ""
-    # else:
-    #     storage_fee_text = pm.get("storage_fee_jan_sep", {}).get("text") or ""
-
-    # GPT projections
-    gp = (res.get("gpt_projection", {}) or {}).get("response", {}) or {}
-    low_units  = gp.get("low_total_sales", "")
-    base_units = gp.get("base_total_sales", "")
-    high_units = gp.get("high_total_sales", "")
-    # print(low_units, base_units, high_units)
-    # low_revenue = gp.get("low_total_revenue", "")
-    # base_revenue = gp.get("base_total_revenue", "")
-    # high_revenue = gp.get("high_total_revenue", "")
-    # low_prof = gp.get("low_total_profit", "")
-    # base_prof = gp.get("base_total_profit_start_ads", "")
-    # high_prof = gp.get("high_total_profit", "")
-    # if low_prof != "" and low_units != "":
-    #     low_ppu = f"${low_prof / low_units:.2f}"
-    # else:
-    #     low_ppu = ""
-    # if base_prof != "" and base_units != "":
-    #     base_ppu = f"${base_prof / base_units:.2f}"
-    # else:
-    #     base_ppu = ""
-    # if high_prof != "" and high_units != "":
-    #     high_ppu = f"${high_prof / high_units:.2f}"
-    # else:
-    #     high_ppu = ""
-
-    # print("afect cols", AFFECTED_COLS)
-    # print("afect cols", AFFECTED_COLS)
-    AFFECTED_COLS[0], AFFECTED_COLS[1], AFFECTED_COLS[2] = ORIGINAL_COL_UNITS_20, ORIGINAL_COL_UNITS_15, ORIGINAL_COL_UNITS_10
-    if seller_type == "vendor":
-        if country not in ["US", "CAN"]:
-            for i,col in enumerate(AFFECTED_COLS):
-                AFFECTED_COLS[i]+=3
-        else:
-            for i,col in enumerate(AFFECTED_COLS):
-                AFFECTED_COLS[i]+=2
-    elif seller_type == "existing_seller":
-        if country not in ["US", "CAN", "AUS"]:
-            # print("affected columns :", AFFECTED_COLS)
-            for i,col in enumerate(AFFECTED_COLS):
-                AFFECTED_COLS[i]+=1
-            # print("affected columns :", AFFECTED_COLS)
-        else:
-            for i,col in enumerate(AFFECTED_COLS):
-                AFFECTED_COLS[i]-=0
-    else: #for new seller
-        if country not in ["US", "CAN", "AUS"]:
-            for i,col in enumerate(AFFECTED_COLS):
-                AFFECTED_COLS[i]-=1
-        else:
-            for i,col in enumerate(AFFECTED_COLS):
-                AFFECTED_COLS[i]-=2
-    
-    COL_UNITS_10, COL_UNITS_15, COL_UNITS_20 = AFFECTED_COLS[0], AFFECTED_COLS[1], AFFECTED_COLS[2]
+    cat_rev_text = _NON_NUMERIC_RE.sub('', _dig(res, "category_revenue", "text") or "")
+    monthly_parent_rev_text = _NON_NUMERIC_RE.sub('', _dig(res, "monthly_revenue", "meta", "parent_level_revenue_text") or "")
 
-    # Fill requested columns
+    # Fill requested columns (empty strings are skipped by _partial_cells_data)
     row[COL_CATEGORY]            = _hyper(categoryUrl, keyword) if categoryUrl else keyword
     row[COL_PRODUCTS]            = _hyper(url, productname) if url else productname
-    row[COL_CURRENT_MREV]        = monthly_parent_rev_text
     if seller_type == "new_seller":
+        # new seller has no product yet: current mrev and units columns stay empty
         row[COL_MONTHLY_MARKETCAP_1+1] = cat_rev_text
-    else:
-        row[COL_MONTHLY_MARKETCAP_1] = cat_rev_text
-    
-
-
-
-
-    # row[COL_YOUR_COMPETITOR]     = _hyper(comp_url, comp_title) if (comp_url or comp_title) else ""
-    # row[COL_COMP_MREV]           = comp_mrev
-    # row[COL_YOUR_PRICE]          = price_text
-    # row[COL_FBA_FEES]            = fba_text
-    # row[COL_STORAGE_FEES]        = storage_fee_text
-    # row[COL_PPU_20]              = low_ppu
-    # row[COL_PPU_15]              = base_ppu
-    # row[COL_PPU_10]              = high_ppu
-    row[COL_UNITS_20]            = str(low_units) if low_units != "" else ""
-    row[COL_UNITS_15]            = str(base_units) if base_units != "" else ""
-    row[COL_UNITS_10]            = str(high_units) if high_units != "" else ""
-    # row[COL_REV_20]              = str(low_revenue) if low_revenue != "" else ""
-    # row[COL_REV_15]              = str(base_revenue) if base_revenue != "" else ""
-    # row[COL_REV_10]              = str(high_revenue) if high_revenue != "" else ""
+        return row
 
-    if seller_type == 'new_seller':
-        # for new seller, we need to clear the current mrev and units columns since it has no product yet
-        # row[COL_PRODUCTS+1] = row[COL_PRODUCTS]   #copies this value in case of new seller
-        row[COL_CURRENT_MREV] = ""
-        row[COL_UNITS_10] = ""
-        row[COL_UNITS_15] = ""
-        row[COL_UNITS_20] = ""
-    else:
-        pass #handled in manual.py, uses competitor data from the CSV file
-
-    COL_UNITS_20, COL_UNITS_15, COL_UNITS_10 = ORIGINAL_COL_UNITS_20, ORIGINAL_COL_UNITS_15, ORIGINAL_COL_UNITS_10
+    row[COL_CURRENT_MREV]        = monthly_parent_rev_text
+    row[COL_MONTHLY_MARKETCAP_1] = cat_rev_text
 
+    # GPT projections (competitor/profitability columns are handled in manual.py from the CSV)
+    gp = _dig(res, "gpt_projection", "response", default=SENTINEL_DICT)
+    try:
+        units_vals = _UNITS_GETTER(gp)
+    except (KeyError, TypeError):
+        # partial projection: fall back to per-key lookups
+        units_vals = [_dig(gp, field) for field in UNITS_FIELDS]
+    for col, units in zip(_units_cols(seller_type, country), units_vals):
+        if units not in ("", None):
+            row[col] = str(units)
 
     return row
 
@@ -475,97 +698,110 @@ def write_results_to_country_tabs(json_results: Dict[str, Any]):
     """
     For each brand -> country -> product:
       - Select sheet by country name (tab must exist: US, UK, CAN, AUS, DE, UAE)
-      - Find first empty row (scan from row 1)
-      - INSERT a new row at that position
-      - Copy FORMAT from the (now shifted) template row below into inserted row
+      - Find first empty row (column A of all tabs is read in one batchGet)
+      - INSERT the tab's new rows at that position in one insertDimension
+      - Copy the last filled (template) row into all of them with one copyPaste
       - Auto-increment 'No.' in col 0
       - Fill target columns (with hyperlinks + fallbacks)
       - Black background + white text on the cells we filled
-      - Leave the original template row right below for the next product
+      - Row inserts/formats for a tab go out in one batchUpdate, cell values in one values.batchUpdate
+      - Tabs are flushed concurrently (rate-limited, with backoff on 429/503)
     """
     global SPREADSHEET_ID
-    # svc = _sheets_service()
+    # session = _get_session()
     additional_run_data = []
+    # Fresh tab metadata per run; after that, rows/No. are tracked in memory only.
+    # {(spreadsheet_id, country): [last_filled_row1, next_no]} is shared by brands on the same spreadsheet.
+    _SHEET_META.clear()
+    tab_counters: Dict[tuple, List[int]] = {}
     for brand_block in json_results.get("runs", []):
         sellerType = brand_block.get("sellerType")
         if sellerType == "vendor":
-            SPREADSHEET_ID = VENDOR_SPREADSHEET_ID
+            SPREADSHEET_ID = _env()["VENDOR_SPREADSHEET_ID"]
         elif sellerType == "existing_seller":
-            SPREADSHEET_ID = EXISTING_SELLER_SPREADSHEET_ID
+            SPREADSHEET_ID = _env()["EXISTING_SELLER_SPREADSHEET_ID"]
         else:
-            SPREADSHEET_ID = NEW_SELLER_SPREADSHEET_ID
+            SPREADSHEET_ID = _env()["NEW_SELLER_SPREADSHEET_ID"]
 
         print("Updated Spread sheet id to ",SPREADSHEET_ID)
-        svc = _sheets_service()
+        session = _get_session()
 
+        # Resolve every target tab first so column A can be fetched in a single batchGet
+        targets = []
         for country_block in brand_block.get("countries", []):
             country = country_block.get("name") or ""
             if not country:
                 continue
 
             try:
-                sheet_id, col_count = _get_sheet_id_and_cols(svc, country)
+                sheet_id, col_count = _get_sheet_id_and_cols(session, country)
                 if col_count < ROW_WIDTH:
                     col_count = ROW_WIDTH
             except Exception as e:
                 print(f'[WARN] Skipping country "{country}": {e}')
                 continue
+            targets.append((country_block, country, sheet_id, col_count))
 
-            for prod in country_block.get("products", []):
-                # 1) Build values for this product
-                # sellerType = brand_block.get("sellerType")
-                print("Seller type",sellerType)
-                row_vals = _build_row_from_product(prod,sellerType,country)
-
-                # 2) Duplicate last filled row and get the new row index (1-based)
-                new_row1 = _insert_duplicate_of_last_row(svc, sheet_id, country, col_count)
-
-                # 3) Prepare selective overwrites (preserve formulas/values elsewhere)
-                col_to_value = {}
+        # One column-A snapshot per tab per run; column A is never re-read after that
+        unseen = [t for t in dict.fromkeys(t[1] for t in targets) if (SPREADSHEET_ID, t) not in tab_counters]
+        for title, col_a in _read_col_a_for_tabs(session, unseen).items():
+            tab_counters[(SPREADSHEET_ID, title)] = [len(col_a), _last_no_value(col_a) + 1]
 
-                # Auto-increment "No."
-                next_no = _next_no_value(svc, country)
-                col_to_value[COL_NO] = str(next_no)
+        # Plan every tab sequentially (row builder + counters), then flush them concurrently
+        packets = []
+        for country_block, country, sheet_id, col_count in targets:
+            last_filled_row1, next_no = tab_counters.get((SPREADSHEET_ID, country), [0, 1])
+            # Every new row on this tab is a copy of the row that is last filled right now
+            template_row1 = last_filled_row1
 
-                # Only overwrite columns that your builder actually populated (non-empty)
-                for c_idx, val in enumerate(row_vals):
-                    if val not in (None, ""):
-                        col_to_value[c_idx] = val
+            # Columns that get black bg + white font — the same for every row on this tab
+            fmt_cols = _format_cols(sellerType, country)
 
-                # 4) Overwrite just those cells
-                _write_partial_cells(svc, country, new_row1, col_to_value)
+            values_data: List[dict] = []
+            written = []
 
-                insert_row0 = new_row1-1
-
-
-                # 5) Apply black bg + white font on filled cells in the inserted row
-                if sellerType == 'new_seller':
-                    _format_cells_black_bg_white_font(svc, sheet_id, row0=insert_row0, col_indices=[COL_NO, COL_CATEGORY, COL_PRODUCTS,COL_CURRENT_MREV,COL_MONTHLY_MARKETCAP_1+1])
-                else:
-                    if sellerType  == 'vendor':
-                        new_cols = FILLED_COLS
-                        if country not in ["US", "CAN"]: 
-                            new_cols[-1] = ORIGINAL_COL_UNITS_10 -1
-                            new_cols[-2] = ORIGINAL_COL_UNITS_15 -1
-                            new_cols[-3] = ORIGINAL_COL_UNITS_10 + 3
-                            _format_cells_black_bg_white_font(svc, sheet_id, row0=insert_row0, col_indices=new_cols)
-                        else:
-                            new_cols[-1] = ORIGINAL_COL_UNITS_10 +2
-                            new_cols[-2] = ORIGINAL_COL_UNITS_15 +2
-                            new_cols[-3] = ORIGINAL_COL_UNITS_20 +2
-                            _format_cells_black_bg_white_font(svc, sheet_id, row0=insert_row0, col_indices=new_cols)
-                    else:  #existing seller
-                        new_cols = FILLED_COLS
-                        if country not in ["US", "CAN", "AUS"]:
-                            new_cols[-1] = ORIGINAL_COL_UNITS_20 +1
-                            new_cols[-2] = ORIGINAL_COL_UNITS_15 +1
-                            new_cols[-3] = ORIGINAL_COL_UNITS_10 +1
-                        else:
-                            pass
-                        _format_cells_black_bg_white_font(svc, sheet_id, row0=insert_row0, col_indices=new_cols)
-
-                print(f'[SHEETS] Inserted+Wrote row {insert_row0+1} to "{country}" (No.={next_no})')
-                additional_run_data.append({"row":insert_row0+1, "country":country, "keyword": prod['keyword'], 'csvname': prod['csvFile'] , 'csvpath':prod['csvFilePath'] , 'seller_type':sellerType})
+            for prod in country_block.get("products", []):
+                # 1) Build values for this product
+                # sellerType = brand_block.get("sellerType")
+                print("Seller type",sellerType)
+                row_cells = _build_row_from_product(prod,sellerType,country)
+
+                # 2) The new row sits right below the last filled one (1-based); inserted in bulk below
+                new_row1 = last_filled_row1 + 1
+
+                # 3) Selective overwrites (preserve formulas/values elsewhere): the builder's
+                #    populated columns plus the auto-incremented "No."
+                row_cells[COL_NO] = str(next_no)
+
+                # 4) Queue overwriting just those cells
+                values_data += _partial_cells_data(country, new_row1, row_cells)
+
+                written.append((new_row1, next_no, prod))
+                last_filled_row1 = new_row1
+                next_no += 1
+
+            tab_counters[(SPREADSHEET_ID, country)] = [last_filled_row1, next_no]
+            _bump_row_count(country, len(written))
+            # 5) Insert + duplicate all of the tab's rows, then black bg + white font over the
+            #    whole block of new rows (one repeatCell per contiguous column run)
+            requests = (
+                _append_rows_requests(sheet_id, template_row1, len(written), col_count)
+                + (_black_bg_white_font_requests(sheet_id, template_row1, last_filled_row1, fmt_cols) if written else [])
+            )
+            packets.append((country, requests, values_data, written))
+
+        # 6) Flush every tab in parallel: one spreadsheets.batchUpdate + one values.batchUpdate each.
+        #    All futures are joined before SPREADSHEET_ID moves on to the next brand.
+        if not packets:
+            continue
+        with ThreadPoolExecutor(max_workers=min(MAX_WRITE_WORKERS, len(packets))) as pool:
+            futures = [pool.submit(_flush_country_batch, requests, values_data)
+                       for _, requests, values_data, _ in packets]
+            for (country, _, _, written), fut in zip(packets, futures):
+                fut.result()
+                for new_row1, no, prod in written:
+                    print(f'[SHEETS] Inserted+Wrote row {new_row1} to "{country}" (No.={no})')
+                    additional_run_data.append({"row":new_row1, "country":country, "keyword": prod['keyword'], 'csvname': prod['csvFile'] , 'csvpath':prod['csvFilePath'] , 'seller_type':sellerType})
     return additional_run_data
 # === Local test runner (no scraper required) ===# === Local test runner (no scraper required) ===
 def main():